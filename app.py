@@ -3,13 +3,39 @@ from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from config import Config
 from flask_mail import Mail
+from database import configure_sqlite
 
 app = Flask(__name__)
 app.config.from_object(Config)
 db = SQLAlchemy(app=app)
+with app.app_context():
+    configure_sqlite(
+        db.engine,
+        journal_mode=app.config['SQLITE_JOURNAL_MODE'],
+        synchronous=app.config['SQLITE_SYNCHRONOUS'],
+        busy_timeout=app.config['SQLITE_BUSY_TIMEOUT'],
+        mmap_size=app.config['SQLITE_MMAP_SIZE']
+    )
 migrate = Migrate(app=app, db=db)
 mail = Mail(app)
 
 
 import user_route
 import country_route
+import country_sync
+import country_snapshot
+import metrics_route
+import profiling_route
+
+from country_data import countries
+
+if app.config['COUNTRY_DATA_SOURCE'] == 'db':
+    countries.loader = country_sync.load_countries_from_db
+elif app.config['COUNTRY_SHARED_FETCH_DIR']:
+    countries.loader = country_snapshot.SharedFetch(
+        countries.loader, app.config['COUNTRY_SHARED_FETCH_DIR'], app.config['COUNTRY_SHARED_FETCH_WINDOW'])
+
+country_snapshot.seed_from_snapshot(countries, app.config['COUNTRY_SNAPSHOT_PATH'])
+
+if app.config['COUNTRY_CACHE_WARM_UP']:
+    countries.warm_up(background=True)
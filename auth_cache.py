@@ -0,0 +1,74 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from config import Config
+from metrics import CACHE_LOOKUPS, CACHE_MISSES
+
+
+# What verify_token hands to the routes as auth.current_user()
+AuthUser = namedtuple('AuthUser', ['id', 'email'])
+
+
+class TokenCache:
+    """Bounded LRU map of token digest -> AuthUser with per-entry expiry.
+
+    Entries live for at most `ttl` seconds and never past the token's own
+    `exp`, so a cached token can't outlive its signature. The cache is per
+    process: after a logout or reset in one worker, the other workers keep
+    accepting the token for at most `ttl` seconds.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        CACHE_LOOKUPS.labels('auth').inc()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                CACHE_MISSES.labels('auth').inc()
+                return None
+            identity, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                CACHE_MISSES.labels('auth').inc()
+                return None
+            self._entries.move_to_end(key)
+            return identity
+
+    def put(self, token, identity, token_exp):
+        if self.maxsize <= 0:
+            return
+        key = self.key(token)
+        expires_at = min(time.time() + self.ttl, token_exp)
+        with self._lock:
+            self._entries[key] = (identity, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(self.key(token), None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [k for k, (identity, _) in self._entries.items() if identity.id == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(maxsize=Config.AUTH_CACHE_SIZE, ttl=Config.AUTH_CACHE_TTL)
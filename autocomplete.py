@@ -0,0 +1,87 @@
+import unicodedata
+from bisect import bisect_left
+
+
+def fold(value):
+    """Casefold and strip accents so 'cote' matches "Côte d'Ivoire"."""
+    decomposed = unicodedata.normalize('NFKD', value.strip().casefold())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    """Type-ahead over country names, official names, alternate spellings and capitals.
+
+    Prefix matches come from a sorted term list searched with bisect. When there
+    are not enough of them, a trigram index supplies typo-tolerant matches.
+    """
+
+    MIN_FUZZY_LENGTH = 3
+    MIN_FUZZY_SCORE = 0.5
+
+    def __init__(self, countries):
+        entries = {}
+        for country in countries:
+            name = country.get('name', {})
+            terms = [(name.get('common'), 'name'), (name.get('official'), 'official_name')]
+            terms += [(spelling, 'alt_spelling') for spelling in country.get('altSpellings') or []]
+            terms += [(capital, 'capital') for capital in country.get('capital') or []]
+            for term, kind in terms:
+                if term:
+                    entries.setdefault((fold(term), name.get('common')), (term, kind))
+
+        # (folded term, country name, display term, kind), sorted by folded term
+        self.terms = sorted((key[0], key[1]) + value for key, value in entries.items())
+        self.keys = [entry[0] for entry in self.terms]
+
+        self.by_trigram = {}
+        for position, entry in enumerate(self.terms):
+            for gram in trigrams(entry[0]):
+                self.by_trigram.setdefault(gram, []).append(position)
+
+    def complete(self, text, limit=10):
+        query = fold(text)
+        if not query:
+            return []
+
+        seen = set()
+        results = []
+        start = bisect_left(self.keys, query)
+        for position in range(start, len(self.terms)):
+            if not self.keys[position].startswith(query) or len(results) >= limit:
+                break
+            self._add(results, seen, position)
+
+        if len(results) < limit and len(query) >= self.MIN_FUZZY_LENGTH:
+            for position in self._fuzzy(query):
+                if len(results) >= limit:
+                    break
+                self._add(results, seen, position)
+        return results
+
+    def _fuzzy(self, query):
+        query_grams = trigrams(query)
+        shared = {}
+        for gram in query_grams:
+            for position in self.by_trigram.get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+
+        scored = []
+        for position, count in shared.items():
+            score = count / len(query_grams)
+            if score >= self.MIN_FUZZY_SCORE:
+                length_gap = abs(len(self.keys[position]) - len(query))
+                scored.append((-score, length_gap, position))
+        scored.sort()
+        return [position for _, _, position in scored]
+
+    def _add(self, results, seen, position):
+        _, country_name, term, kind = self.terms[position]
+        if country_name in seen:
+            return
+        seen.add(country_name)
+        results.append({'country_name': country_name, 'match': term, 'match_type': kind})
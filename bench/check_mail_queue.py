@@ -0,0 +1,132 @@
+"""Check the mail queue against a local SMTP stand-in.
+
+Sends mail through MailQueue to bench/fake_smtp.py and checks, per scenario,
+that every message is delivered exactly once and how many SMTP connections
+that took:
+
+- steady: `--messages` messages reuse one connection per worker
+- reconnect: the server hangs up every 25 messages; every message is still
+  delivered exactly once over fresh connections
+- refused: a recipient the server rejects is retried `max_retries` times
+  and marked failed without holding up the rest
+
+Exits non-zero if any scenario fails.
+
+    python bench/check_mail_queue.py
+    python bench/check_mail_queue.py --messages 1000 --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_smtp import FakeSMTP
+
+SENDER = 'bench@example.com'
+REFUSED = 'refused@example.com'
+
+
+def configure(smtp_port, workdir):
+    os.environ['MAIL_SERVER'] = '127.0.0.1'
+    os.environ['MAIL_PORT'] = str(smtp_port)
+    os.environ['MAIL_USE_SSL'] = 'false'
+    os.environ['MAIL_USE_TLS'] = 'false'
+    os.environ['MAIL_USERNAME'] = ''
+    os.environ['MAIL_PASSWORD'] = ''
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'check.db')
+    os.environ['COUNTRY_CACHE_WARM_UP'] = 'false'
+    os.environ['COUNTRY_SNAPSHOT_PATH'] = ''
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+    os.environ.setdefault('SECRET_KEY', 'bench-only-secret-key-0123456789abcdef')
+
+
+def send(smtp, recipients, workers, max_retries=3, timeout=60):
+    """Queue one message per recipient and wait until each is sent or has failed.
+
+    Returns (jobs by recipient, queue counts, connections opened, messages accepted per recipient).
+    """
+    from flask_mail import Message
+    from mail_queue import MailQueue
+
+    connections, delivered = smtp.connections, smtp.delivered.copy()
+    mail_queue = MailQueue(workers=workers, max_retries=max_retries, retry_backoff=0.01)
+    ids = {recipient: mail_queue.enqueue(Message('Check', recipients=[recipient], body='check', sender=SENDER))
+           for recipient in recipients}
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = {recipient: mail_queue.status(job_id) for recipient, job_id in ids.items()}
+        if all(job['status'] in ('sent', 'failed') for job in jobs.values()):
+            break
+        time.sleep(0.02)
+    mail_queue.stop()
+    return jobs, mail_queue.status(), smtp.connections - connections, smtp.delivered - delivered
+
+
+def check_steady(smtp, messages, workers):
+    recipients = [f'steady{n}@example.com' for n in range(messages)]
+    jobs, counts, connections, delivered = send(smtp, recipients, workers)
+    ok = (all(job['status'] == 'sent' for job in jobs.values())
+          and all(delivered[r] == 1 for r in recipients) and connections <= workers)
+    return ok, f'{sum(delivered.values())}/{messages} delivered over {connections} connections ({workers} workers)'
+
+
+def check_reconnect(smtp, messages, workers):
+    recipients = [f'reconnect{n}@example.com' for n in range(messages)]
+    smtp.messages_per_connection = 25
+    try:
+        jobs, counts, connections, delivered = send(smtp, recipients, workers)
+    finally:
+        smtp.messages_per_connection = None
+    ok = (all(job['status'] == 'sent' for job in jobs.values())
+          and all(delivered[r] == 1 for r in recipients) and connections >= messages // 25)
+    return ok, (f'{sum(delivered.values())}/{messages} delivered over {connections} connections, '
+                f'{counts["retried"]} retried')
+
+
+def check_refused(smtp, messages, workers):
+    max_retries = 2
+    recipients = [f'refused-batch{n}@example.com' for n in range(messages)]
+    smtp.refuse.add(REFUSED)
+    try:
+        jobs, counts, connections, delivered = send(smtp, [REFUSED] + recipients, workers, max_retries)
+    finally:
+        smtp.refuse.discard(REFUSED)
+    refused = jobs[REFUSED]
+    ok = (refused['status'] == 'failed' and refused['attempts'] == max_retries + 1
+          and all(jobs[r]['status'] == 'sent' and delivered[r] == 1 for r in recipients))
+    return ok, (f'refused mail {refused["status"]} after {refused["attempts"]} attempts, '
+                f'{sum(delivered.values())}/{messages} others delivered')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    smtp = FakeSMTP().start()
+    configure(smtp.address[1], tempfile.mkdtemp(prefix='worldpeek-mail-'))
+    from app import app
+    # MAIL_DEBUG is always on in Config; keep smtplib's protocol trace out of the report
+    app.extensions['mail'].debug = 0
+
+    failed = False
+    try:
+        with app.app_context():
+            for name, scenario in (('steady', check_steady), ('reconnect', check_reconnect),
+                                   ('refused', check_refused)):
+                ok, detail = scenario(smtp, args.messages, args.workers)
+                failed = failed or not ok
+                print(f'{name:<10} {"ok" if ok else "FAILED":<7} {detail}')
+    finally:
+        smtp.stop()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Check that concurrent readers share one upstream fetch of the country dataset.
+
+Runs CountryDataset against a local fake restcountries (with a delay, so
+loads overlap) and counts the HTTP requests it receives. One fetch of the
+dataset is one request per field group, so each scenario must cost exactly
+that many:
+
+- a cold dataset read from `--threads` threads at once
+- a stale dataset read from `--threads` threads: all are answered from the
+  stale copy while a single background refresh runs
+- `--processes` worker processes on one host sharing a fetch through
+  SharedFetch (COUNTRY_SHARED_FETCH_DIR)
+
+Exits non-zero if any scenario made more requests than that.
+
+    python bench/check_single_flight.py
+    python bench/check_single_flight.py --threads 200 --processes 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_restcountries import FakeRestCountries
+
+
+def configure(upstream_url, workdir):
+    os.environ['RESTCOUNTRIES_URL'] = upstream_url
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'check.db')
+    os.environ['COUNTRY_CACHE_WARM_UP'] = 'false'
+    os.environ['COUNTRY_SNAPSHOT_PATH'] = ''
+    os.environ['COUNTRY_SHARED_FETCH_DIR'] = ''
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+    os.environ.setdefault('SECRET_KEY', 'bench-only-secret-key-0123456789abcdef')
+
+
+def requests_per_fetch():
+    from restcountries import FIELDS, JOIN_FIELD, MAX_FIELDS_PER_REQUEST
+    others = len([f for f in FIELDS if f != JOIN_FIELD])
+    return -(-others // (MAX_FIELDS_PER_REQUEST - 1))
+
+
+def read_concurrently(dataset, threads):
+    """Call dataset.index() from `threads` threads released together; returns (indexes, slowest read)."""
+    barrier = threading.Barrier(threads)
+    indexes, durations = [], []
+    lock = threading.Lock()
+
+    def reader():
+        barrier.wait()
+        started = time.perf_counter()
+        index = dataset.index()
+        with lock:
+            indexes.append(index)
+            durations.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=reader) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return indexes, max(durations)
+
+
+def check_cold(fake, threads):
+    from country_data import CountryDataset
+
+    before = fake.requests
+    indexes, _ = read_concurrently(CountryDataset(), threads)
+    shared = len({id(index) for index in indexes}) == 1
+    return fake.requests - before, f'{threads} threads, one shared copy: {shared}', shared
+
+
+def check_stale(fake, threads):
+    from country_data import CountryDataset
+
+    dataset = CountryDataset(ttl=0.5)
+    dataset.refresh()
+    time.sleep(0.6)
+
+    before, version = fake.requests, dataset.version
+    _, slowest = read_concurrently(dataset, threads)
+    deadline = time.monotonic() + 30
+    while dataset.version == version and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Readers must not have waited on the refresh
+    answered_stale = slowest < fake.latency
+    refreshed = dataset.version == version + 1
+    return (fake.requests - before,
+            f'{threads} threads, slowest read {slowest * 1000:.1f} ms, refreshed once: {refreshed}',
+            answered_stale and refreshed)
+
+
+def check_processes(fake, processes, workdir):
+    shared_dir = os.path.join(workdir, 'shared')
+    before = fake.requests
+    children = [subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', shared_dir],
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                for _ in range(processes)]
+    # Release the fetches together once every process has imported the app
+    for child in children:
+        if child.stdout.readline().strip() != 'ready':
+            raise RuntimeError('A worker process failed to start')
+    for child in children:
+        child.stdin.write('go\n')
+        child.stdin.flush()
+    counts = {child.communicate()[0].strip() for child in children}
+    ok = all(child.returncode == 0 for child in children) and len(counts) == 1
+    return fake.requests - before, f'{processes} processes, countries loaded: {", ".join(sorted(counts))}', ok
+
+
+def child(shared_dir):
+    """One worker process: load the dataset through SharedFetch when told to."""
+    import app  # noqa: F401 (the app has to be imported before country_snapshot)
+    from country_data import CountryDataset, fetch_all_countries
+    from country_snapshot import SharedFetch
+
+    dataset = CountryDataset(loader=SharedFetch(fetch_all_countries, shared_dir))
+    print('ready', flush=True)
+    sys.stdin.readline()
+    print(len(dataset.get()), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=50)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--upstream-latency', type=float, default=0.2)
+    parser.add_argument('--child', metavar='SHARED_DIR', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='worldpeek-single-flight-')
+    fake = FakeRestCountries(latency=args.upstream_latency).start()
+    configure(fake.url, workdir)
+    import app  # noqa: F401
+    from country_snapshot import fcntl
+
+    expected = requests_per_fetch()
+    scenarios = [
+        ('cold dataset', lambda: check_cold(fake, args.threads)),
+        ('stale dataset', lambda: check_stale(fake, args.threads)),
+    ]
+    if fcntl is not None:
+        scenarios.append(('shared fetch', lambda: check_processes(fake, args.processes, workdir)))
+    else:
+        print('shared fetch: skipped, file locks are not available on this platform')
+
+    failed = False
+    try:
+        for name, scenario in scenarios:
+            made, detail, ok = scenario()
+            ok = ok and made == expected
+            failed = failed or not ok
+            print(f'{name:<14} {"ok" if ok else "FAILED":<7} {made} upstream requests '
+                  f'(expected {expected}), {detail}')
+    finally:
+        fake.stop()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Where the country routes spend their time: on the CPU or waiting.
+
+Async views only pay off when a request spends its time waiting on the
+network or the database. This drives /country_list, /search_by_country,
+/search_by_capital and /country_custom_info from `--concurrency` threads
+against a throwaway SQLite database and the bundled fixture, and reports per
+route: requests/sec, p50/p99 latency and the share of each request's wall time
+its thread spent off the CPU (waiting on I/O, locks or the GIL).
+
+    python bench/country_routes.py --concurrency 1 8 64 --seconds 5
+    python bench/country_routes.py --auth-cache-size 0   # every request verifies its token in the DB
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ROUTES = [
+    ('GET', '/country_list', None),
+    ('POST', '/search_by_country', {'country_name': 'Nigeria'}),
+    ('POST', '/search_by_capital', {'capital': 'Paris'}),
+    ('POST', '/country_custom_info', {'country_name': 'Germany', 'fields': ['capital', 'population']}),
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def create_app(auth_cache_size):
+    """Import the app against a temporary database, with the fixture as the dataset."""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['AUTH_CACHE_SIZE'] = str(auth_cache_size)
+    os.environ['COUNTRY_CACHE_WARM_UP'] = 'false'
+    os.environ['COUNTRY_SNAPSHOT_PATH'] = ''
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+    os.environ.setdefault('SECRET_KEY', 'bench-only-secret-key-0123456789abcdef')
+
+    from app import app, db
+    from country_data import countries
+
+    with open(os.path.join(ROOT, 'fixtures', 'countries.json'), encoding='utf-8') as f:
+        fixture = json.load(f)
+    countries.loader = lambda: fixture
+    countries.refresh()
+
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.post('/register', json={'first_name': 'Bench', 'email': 'bench@example.com', 'password': 'bench-password'})
+    token = client.post('/login', json={'email': 'bench@example.com', 'password': 'bench-password'}).json['token']
+    return app, {'Authorization': 'Bearer ' + token}
+
+
+def run(app, headers, method, path, body, concurrency, seconds):
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def request_loop():
+        client = app.test_client()
+        local = []
+        while time.perf_counter() < deadline:
+            wall, cpu = time.perf_counter(), time.thread_time()
+            response = client.open(path, method=method, json=body, headers=headers)
+            local.append((time.perf_counter() - wall, time.thread_time() - cpu))
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} returned {response.status_code}')
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=request_loop) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [wall for wall, _ in samples]
+    total_wall = sum(latencies)
+    total_cpu = sum(cpu for _, cpu in samples)
+    return {
+        'rps': len(samples) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'waiting': 1 - total_cpu / total_wall if total_wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--auth-cache-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    app, headers = create_app(args.auth_cache_size)
+
+    print(f'auth_cache_size={args.auth_cache_size} seconds={args.seconds}')
+    print(f'{"route":<22}{"threads":>8}{"req/sec":>10}{"p50 ms":>9}{"p99 ms":>9}{"waiting":>9}')
+    for method, path, body in ROUTES:
+        for concurrency in args.concurrency:
+            result = run(app, headers, method, path, body, concurrency, args.seconds)
+            print(f'{path:<22}{concurrency:>8}{result["rps"]:>10.0f}{result["p50_ms"]:>9.2f}'
+                  f'{result["p99_ms"]:>9.2f}{result["waiting"]:>9.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Local stand-in for restcountries.com that serves a fixture file.
+
+Answers GET /all (and /v3.1/all) with the fixture, projected to `?fields=`
+and, like the real API, rejects requests for more than 10 fields. Used by
+bench/load_test.py; can also be run on its own:
+
+    python bench/fake_restcountries.py --port 8099
+    RESTCOUNTRIES_URL=http://127.0.0.1:8099 flask run
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FIXTURE = os.path.join(ROOT, 'fixtures', 'countries.json')
+
+
+class FakeRestCountries:
+    """Threaded HTTP server serving `fixture_path`, with an optional per-request delay."""
+
+    def __init__(self, fixture_path=DEFAULT_FIXTURE, host='127.0.0.1', port=0, latency=0.0):
+        with open(fixture_path, encoding='utf-8') as f:
+            self.countries = json.load(f)
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-restcountries', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, path):
+        """(status, body) for a request path."""
+        url = urllib.parse.urlparse(path)
+        if url.path.rstrip('/') not in ('/all', '/v3.1/all'):
+            return 404, {'status': 404, 'message': 'Not Found'}
+
+        fields = [f for f in urllib.parse.parse_qs(url.query).get('fields', [''])[0].split(',') if f]
+        if len(fields) > 10:
+            return 400, {'status': 400, 'message': 'Bad Request'}
+        if not fields:
+            return 200, self.countries
+        return 200, [{k: country[k] for k in fields if k in country} for country in self.countries]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                status, payload = fake.respond(self.path)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each response.')
+    args = parser.parse_args()
+
+    fake = FakeRestCountries(args.fixture, args.host, args.port, args.latency)
+    print(f'Serving {len(fake.countries)} countries from {args.fixture} on {fake.url}')
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Local SMTP stand-in that accepts mail and counts it.
+
+Speaks just enough SMTP for smtplib and Flask-Mail (EHLO/HELO, MAIL, RCPT,
+DATA, RSET, NOOP, QUIT; no TLS or AUTH). It can hang up on a connection after
+a number of messages, and refuse chosen recipients, to exercise reconnects
+and retries. Used by bench/check_mail_queue.py; can also be run on its own:
+
+    python bench/fake_smtp.py --port 8025
+    MAIL_SERVER=127.0.0.1 MAIL_PORT=8025 MAIL_USE_SSL=false flask run
+"""
+import argparse
+import socketserver
+import threading
+import time
+from collections import Counter
+
+
+class FakeSMTP:
+    """Threaded SMTP server recording who each accepted message was for."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, messages_per_connection=None,
+                 refuse=()):
+        self.latency = latency
+        self.messages_per_connection = messages_per_connection
+        self.refuse = set(refuse)
+        self.connections = 0
+        self.delivered = Counter()  # recipient -> messages accepted for it
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    @property
+    def messages(self):
+        with self._lock:
+            return sum(self.delivered.values())
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-smtp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b'\r\n')
+
+            def handle(self):
+                with fake._lock:
+                    fake.connections += 1
+                accepted = 0
+                recipients = []
+                self.reply('220 fake-smtp ready')
+                for raw in self.rfile:
+                    command = raw.decode('utf-8', 'replace').strip()
+                    verb = command[:4].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        self.reply('250 fake-smtp')
+                    elif verb == 'MAIL':
+                        if fake.messages_per_connection and accepted >= fake.messages_per_connection:
+                            self.reply('421 closing connection')
+                            return
+                        recipients = []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        address = command.split(':', 1)[1].strip().strip('<>').split('>')[0]
+                        if address in fake.refuse:
+                            self.reply('550 no such user')
+                        else:
+                            recipients.append(address)
+                            self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 end data with <CR><LF>.<CR><LF>')
+                        for line in self.rfile:
+                            if line in (b'.\r\n', b'.\n'):
+                                break
+                        if fake.latency:
+                            time.sleep(fake.latency)
+                        with fake._lock:
+                            fake.delivered.update(recipients)
+                        accepted += 1
+                        self.reply('250 OK queued')
+                    elif verb in ('RSET', 'NOOP'):
+                        recipients = []
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 bye')
+                        return
+                    else:
+                        self.reply('502 command not implemented')
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before accepting each message.')
+    args = parser.parse_args()
+
+    fake = FakeSMTP(args.host, args.port, args.latency)
+    print(f'Accepting mail on {args.host}:{fake.address[1]}')
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f'{fake.messages} messages over {fake.connections} connections')
+
+
+if __name__ == '__main__':
+    main()
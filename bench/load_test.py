@@ -0,0 +1,258 @@
+"""Endpoint load test: throughput and latency percentiles, saved as JSON.
+
+Starts the app (`flask run`) against a temporary SQLite database migrated
+with `flask db upgrade` and a local fake restcountries serving the fixture,
+then drives each scenario from `--concurrency` threads for `--seconds` and
+reports requests/sec with p50/p95/p99 latency. Results are written to
+`--output` (bench/results/<timestamp>.json by default); pass an earlier file
+as `--compare` to print the change and exit non-zero on a regression.
+
+    python bench/load_test.py
+    python bench/load_test.py --scenarios search_by_country history --concurrency 1 16 64
+    python bench/load_test.py --compare bench/results/baseline.json --threshold 10
+    python bench/load_test.py --url http://127.0.0.1:5000   # an already running server
+
+Environment variables (PASSWORD_HASH_METHOD, AUTH_CACHE_SIZE, ...) are passed
+through to the app, so configurations can be compared run against run.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+from fake_restcountries import DEFAULT_FIXTURE, ROOT, FakeRestCountries
+
+USER = {'first_name': 'Bench', 'email': 'bench@example.com', 'password': 'bench-password'}
+
+
+def scenarios(country_names):
+    """name -> (method, path, json body for the n-th request or None, needs auth)"""
+    return {
+        'country_list': ('GET', '/country_list', None, True),
+        'search_by_country': ('POST', '/search_by_country',
+                              lambda n: {'country_name': country_names[n % len(country_names)]}, True),
+        'login': ('POST', '/login', lambda n: {'email': USER['email'], 'password': USER['password']}, False),
+        'history': ('GET', '/history', None, True),
+    }
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(upstream_url, workdir):
+    """Migrate a fresh SQLite database and start `flask run` on it; returns (process, base url)."""
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL='sqlite:///' + os.path.join(workdir, 'bench.db'),
+        RESTCOUNTRIES_URL=upstream_url,
+        COUNTRY_SNAPSHOT_PATH='',
+        COUNTRY_SHARED_FETCH_DIR='',
+        COUNTRY_DATA_SOURCE='api',
+        FLASK_APP='app',
+    )
+    env.setdefault('SECRET_KEY', 'bench-only-secret-key-0123456789abcdef')
+
+    subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade'], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    log = open(os.path.join(workdir, 'app.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'flask', 'run', '--port', str(port), '--no-reload', '--no-debugger'],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'The app exited during start-up, see {log.name}')
+        try:
+            requests.get(url + '/country_list', timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'The app did not start within 30 seconds, see {log.name}')
+
+
+def prepare(url, history_rows, country_names):
+    """Create the bench user, log in and record some searches for /history to page through."""
+    session = requests.Session()
+    session.post(url + '/register', json=USER)
+    response = session.post(url + '/login', json={'email': USER['email'], 'password': USER['password']})
+    response.raise_for_status()
+    headers = {'Authorization': 'Bearer ' + response.json()['token']}
+
+    for n in range(0, history_rows, 100):
+        batch = [country_names[i % len(country_names)] for i in range(n, min(n + 100, history_rows))]
+        session.post(url + '/search_by_countries', json={'countries': batch}, headers=headers).raise_for_status()
+    return headers
+
+
+def run(url, scenario, headers, concurrency, seconds, warmup):
+    method, path, body, needs_auth = scenario
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(sys.maxsize))
+    start = time.perf_counter() + warmup
+    deadline = start + seconds
+
+    def worker():
+        session = requests.Session()
+        local_latencies, local_errors = [], 0
+        while True:
+            n = next(counter)
+            sent = time.perf_counter()
+            if sent >= deadline:
+                break
+            try:
+                response = session.request(method, url + path, json=body(n) if body else None,
+                                           headers=headers if needs_auth else None, timeout=30)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            if sent >= start:  # discard the warm-up
+                if ok:
+                    local_latencies.append(time.perf_counter() - sent)
+                else:
+                    local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result = {'concurrency': concurrency, 'requests': len(latencies), 'errors': sum(errors),
+              'rps': len(latencies) / seconds}
+    if latencies:
+        result.update({
+            'mean_ms': sum(latencies) / len(latencies) * 1000,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': max(latencies) * 1000,
+        })
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print the change against a previous run; returns the regressions found."""
+    previous = {(r['scenario'], r['concurrency']): r for r in baseline['results']}
+    regressions = []
+    print(f'\nCompared with {baseline.get("revision") or "baseline"} ({baseline.get("started_at")}):')
+    for result in results:
+        before = previous.get((result['scenario'], result['concurrency']))
+        if not before or 'p99_ms' not in result or 'p99_ms' not in before or not before['rps']:
+            continue
+        rps_change = (result['rps'] / before['rps'] - 1) * 100
+        p99_change = (result['p99_ms'] / before['p99_ms'] - 1) * 100
+        regressed = rps_change < -threshold or p99_change > threshold
+        if regressed:
+            regressions.append(result)
+        print(f'{result["scenario"]:<20}{result["concurrency"]:>6}  req/sec {rps_change:+7.1f}%  '
+              f'p99 {p99_change:+7.1f}%{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', default=['country_list', 'search_by_country', 'login', 'history'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--history-rows', type=int, default=500, help='Searches recorded before the run.')
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE)
+    parser.add_argument('--upstream-latency', type=float, default=0.0)
+    parser.add_argument('--url', help='Benchmark this running server instead of starting one.')
+    parser.add_argument('--output', help='Where to save the results (default bench/results/<timestamp>.json).')
+    parser.add_argument('--compare', help='Results file from an earlier run to compare against.')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Percent drop in req/sec or rise in p99 counted as a regression.')
+    args = parser.parse_args()
+
+    with open(args.fixture, encoding='utf-8') as f:
+        country_names = [country['name']['common'] for country in json.load(f)]
+    available = scenarios(country_names)
+    unknown = set(args.scenarios) - set(available)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))} (choose from {", ".join(available)})')
+
+    upstream = process = None
+    workdir = tempfile.mkdtemp(prefix='worldpeek-bench-')
+    url = args.url
+    if not url:
+        upstream = FakeRestCountries(args.fixture, latency=args.upstream_latency).start()
+        process, url = start_app(upstream.url, workdir)
+
+    started_at = datetime.now().isoformat(timespec='seconds')
+    results = []
+    try:
+        headers = prepare(url, args.history_rows, country_names)
+        print(f'{"scenario":<20}{"threads":>8}{"req/sec":>10}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"errors":>8}')
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                result = dict(run(url, available[name], headers, concurrency, args.seconds, args.warmup),
+                              scenario=name)
+                results.append(result)
+                print(f'{name:<20}{concurrency:>8}{result["rps"]:>10.1f}{result.get("p50_ms", 0):>9.2f}'
+                      f'{result.get("p95_ms", 0):>9.2f}{result.get("p99_ms", 0):>9.2f}{result["errors"]:>8}')
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if upstream is not None:
+            upstream.stop()
+
+    report = {
+        'started_at': started_at,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'results': results,
+    }
+    output = args.output or os.path.join(ROOT, 'bench', 'results', started_at.replace(':', '-') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nSaved results to {output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            if compare(results, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
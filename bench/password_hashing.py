@@ -0,0 +1,62 @@
+"""Password verification throughput by hashing pool size.
+
+Simulates a login storm: `--concurrency` threads call check_password (the
+CPU-bound part of /login) as fast as they can for `--seconds`, once per pool
+size in `--workers`. Prints logins/sec for each.
+
+    python bench/password_hashing.py --workers 0 1 2 4 --method scrypt
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher  # noqa: E402
+
+
+def run(workers, method, concurrency, seconds):
+    hasher = PasswordHasher(method=method, workers=workers)
+    password_hash = hasher.hash('correct horse battery staple')
+    hasher.verify(password_hash, 'warm up the pool')
+
+    done = []
+    deadline = time.perf_counter() + seconds
+
+    def login_loop():
+        count = 0
+        while time.perf_counter() < deadline:
+            hasher.verify(password_hash, 'correct horse battery staple')
+            count += 1
+        done.append(count)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=login_loop) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    hasher.shutdown()
+    return sum(done) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4, os.cpu_count()])
+    parser.add_argument('--method', default=os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'))
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f'method={args.method} concurrency={args.concurrency} seconds={args.seconds}')
+    print(f'{"workers":>8}  {"logins/sec":>10}')
+    for workers in sorted(set(args.workers)):
+        print(f'{workers:>8}  {run(workers, args.method, args.concurrency, args.seconds):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import logging
+import threading
+import time
+
+import requests
+
+from autocomplete import AutocompleteIndex
+from config import Config
+from country_payloads import CountryPayloads
+from geo_index import GeoIndex
+from metrics import STAGE_SECONDS, timed
+import restcountries
+
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_all_countries():
+    return restcountries.client.fetch_all()
+
+
+def normalize(value):
+    return value.strip().casefold()
+
+
+def add_to_index(index, value, country):
+    if not value:
+        return
+    matches = index.setdefault(normalize(value), [])
+    if not matches or matches[-1] is not country:
+        matches.append(country)
+
+
+class CountryIndex:
+    """One loaded copy of the dataset plus the lookup tables derived from it.
+
+    Built once per load and swapped in as a whole, so readers never see a
+    half-built index.
+    """
+
+    def __init__(self, countries):
+        self.countries = countries
+        self.by_name = {}
+        self.by_code = {}  # ISO 3166-1 alpha-2 and alpha-3
+        self.by_capital = {}
+
+        # Inverted indexes: normalized value -> every country carrying it
+        self.by_timezone = {}
+        self.by_currency = {}  # ISO code or currency name
+        self.by_language = {}  # ISO 639-3 code or language name
+        self.by_region = {}  # region or subregion
+
+        for country in countries:
+            name = country.get('name', {})
+            for key in (name.get('common'), name.get('official')):
+                if key:
+                    self.by_name.setdefault(normalize(key), country)
+            for code in (country.get('cca2'), country.get('cca3')):
+                if code:
+                    self.by_code.setdefault(normalize(code), country)
+            for capital in country.get('capital') or []:
+                self.by_capital.setdefault(normalize(capital), country)
+
+            for timezone in country.get('timezones') or []:
+                add_to_index(self.by_timezone, timezone, country)
+            for code, currency in (country.get('currencies') or {}).items():
+                add_to_index(self.by_currency, code, country)
+                add_to_index(self.by_currency, currency.get('name'), country)
+            for code, language in (country.get('languages') or {}).items():
+                add_to_index(self.by_language, code, country)
+                add_to_index(self.by_language, language, country)
+            add_to_index(self.by_region, country.get('region'), country)
+            add_to_index(self.by_region, country.get('subregion'), country)
+
+        self.autocomplete = AutocompleteIndex(countries)
+        self.geo = GeoIndex(countries)
+        self.payloads = CountryPayloads(countries, Config.COUNTRY_PAYLOAD_CACHE_SIZE)
+
+    @timed(STAGE_SECONDS.labels('match'))
+    def find_by_name(self, name):
+        """Match a common or official country name (case-insensitive)."""
+        return self.by_name.get(normalize(name))
+
+    @timed(STAGE_SECONDS.labels('match'))
+    def find_by_name_or_code(self, value):
+        key = normalize(value)
+        return self.by_name.get(key) or self.by_code.get(key)
+
+    @timed(STAGE_SECONDS.labels('match'))
+    def find_by_capital(self, capital):
+        return self.by_capital.get(normalize(capital))
+
+    @timed(STAGE_SECONDS.labels('match'))
+    def find_all(self, index, value):
+        """Every country listed under `value` in one of the inverted indexes."""
+        return index.get(normalize(value), [])
+
+
+class CountryDataset:
+    """In-process copy of the restcountries dataset shared by all country routes.
+
+    Once loaded, readers always get the data immediately. When the copy is older
+    than `ttl` seconds it keeps being served while a single background thread
+    fetches a fresh one (stale-while-revalidate).
+
+    At most one load runs at a time: concurrent readers wait for the load in
+    flight and share its result, whether it succeeded or failed. After a
+    failure no new load is started for `retry_interval` seconds.
+    """
+
+    def __init__(self, loader=fetch_all_countries, ttl=3600, retry_interval=10):
+        self.loader = loader
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.version = 0
+        self._index = None
+        # -inf rather than 0: time.monotonic() can be smaller than the TTL on a
+        # freshly booted host, and 0 would then still count as fresh
+        self._loaded_at = float('-inf')
+        self._failed_at = float('-inf')
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._loaded = threading.Condition(self._lock)
+
+    def get(self):
+        return self.index().countries
+
+    def index(self):
+        index = self._index
+        if index is None:
+            return self._wait_for_first_load()
+        if time.monotonic() - self._loaded_at > self.ttl:
+            self._refresh_in_background()
+        return index
+
+    def warm_up(self, background=False):
+        """Load the dataset ahead of the first request."""
+        if background:
+            self._refresh_in_background()
+        else:
+            self.refresh()
+
+    def seed(self, countries):
+        """Install a dataset from somewhere other than the loader (e.g. a snapshot).
+
+        The seeded copy is served straight away but counts as stale, so the
+        first read triggers a regular refresh. An already loaded copy is kept.
+        """
+        index = CountryIndex(countries)
+        with self._lock:
+            if self._index is not None:
+                return False
+            self._index = index
+            self._loaded_at = float('-inf')
+            self.version += 1
+            self._loaded.notify_all()
+        return True
+
+    def invalidate(self, drop=False):
+        """Mark the dataset stale so the next read triggers a refresh.
+
+        With `drop=True` the current copy is discarded and the next read blocks
+        until fresh data has been loaded.
+        """
+        with self._lock:
+            self._loaded_at = float('-inf')
+            if drop:
+                self._index = None
+
+    def refresh(self):
+        """Load a fresh copy, or wait for the load already in flight and share its result."""
+        with self._lock:
+            if self._refreshing:
+                while self._refreshing:
+                    self._loaded.wait()
+                return self._index
+            self._refreshing = True
+        return self._load()
+
+    def _wait_for_first_load(self):
+        with self._lock:
+            backing_off = not self._refreshing and self._backing_off()
+        index = None if backing_off else self.refresh()
+        if index is None:
+            raise requests.RequestException('Country dataset is not available')
+        return index
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or self._backing_off():
+                return
+            self._refreshing = True
+        threading.Thread(target=self._load, kwargs={'raise_errors': False}, daemon=True).start()
+
+    def _load(self, raise_errors=True):
+        index = None
+        try:
+            index = CountryIndex(self.loader())
+        except Exception:
+            logger.exception('Failed to load country dataset')
+            if raise_errors:
+                raise
+        finally:
+            with self._lock:
+                if index is not None:
+                    self._index = index
+                    self._loaded_at = time.monotonic()
+                    self.version += 1
+                else:
+                    self._failed_at = time.monotonic()
+                self._refreshing = False
+                self._loaded.notify_all()
+        return index
+
+    def _backing_off(self):
+        return time.monotonic() - self._failed_at < self.retry_interval
+
+
+countries = CountryDataset(ttl=Config.COUNTRY_CACHE_TTL, retry_interval=Config.COUNTRY_CACHE_RETRY_INTERVAL)
@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import json
+from functools import lru_cache
+
+from flask import Response
+
+from metrics import CACHE_LOOKUPS, CACHE_MISSES, STAGE_SECONDS, timed
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+
+# Fields a client can pick in /country_custom_info
+CUSTOM_FIELDS = {
+    'capital': lambda c: c.get('capital', [None])[0],
+    'calling_code': lambda c: c.get('idd', {}).get('root', '') + c.get('idd', {}).get('suffixes', [''])[0],
+    'population': lambda c: c.get('population'),
+    'tld': lambda c: c.get('tld', [None])[0],
+    'timezones': lambda c: c.get('timezones', []),
+    'currencies': lambda c: list(c.get('currencies', {}).values()),
+    'flag': lambda c: c.get('flags', {}).get('svg'),
+    'languages': lambda c: list(c.get('languages', {}).values()),
+    'latlng': lambda c: c.get('latlng', [])
+}
+
+
+def full_country_info(country):
+    """Full details returned by the search routes for one country."""
+    return {
+        'country_name': country['name']['common'],
+        'official_name': country['name']['official'],
+        'capital': country.get('capital', [None])[0],
+        'region': country.get('region'),
+        'subregion': country.get('subregion'),
+        'population': country.get('population'),
+        'calling_code': country.get('idd', {}).get('root', '') +
+                        country.get('idd', {}).get('suffixes', [''])[0],
+        'timezones': country.get('timezones', []),
+        'currencies': list(country.get('currencies', {}).values()),
+        'languages': list(country.get('languages', {}).values()),
+        'flag': country.get('flags', {}).get('svg'),
+        'latlng': country.get('latlng', []),
+        'tld': country.get('tld', [])
+    }
+
+
+def country_list_entry(country):
+    return {
+        'country_name': country.get('name', {}).get('common'),
+        'capital': country.get('capital', [None])[0]
+    }
+
+
+def custom_country_info(country, fields):
+    result = {'country_name': country.get('name', {}).get('common')}
+    for field in fields:
+        result[field] = CUSTOM_FIELDS[field](country)
+    return result
+
+
+def dumps(value):
+    """Encode exactly like jsonify does outside debug mode."""
+    return json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
+
+
+def json_response(body, status=200):
+    return Response(body + b'\n', status=status, mimetype='application/json')
+
+
+class CountryPayloads:
+    """Response bodies rendered ahead of time for one dataset load.
+
+    Full-info bodies are encoded for every country up front. Custom projections
+    are encoded on first use and kept in an LRU cache keyed on the country and
+    the sorted field set. The /country_list body is also stored precompressed,
+    with a strong ETag per encoding derived from its content.
+    """
+
+    def __init__(self, countries, custom_cache_size=4096):
+        self.countries = {id(country): country for country in countries}
+        self.full = {id(country): dumps(full_country_info(country)) for country in countries}
+        self._custom = lru_cache(maxsize=custom_cache_size)(self._render_custom)
+
+        body = dumps([country_list_entry(country) for country in countries]) + b'\n'
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # content-encoding -> (ETag, body); '' is the uncompressed variant
+        self.country_list = {'': (digest, body)}
+        self.country_list['gzip'] = (f'{digest}-gzip', gzip.compress(body, compresslevel=9, mtime=0))
+        if brotli is not None:
+            self.country_list['br'] = (f'{digest}-br', brotli.compress(body, quality=11))
+
+    @timed(STAGE_SECONDS.labels('serialization'))
+    def country_list_variant(self, accept_encodings):
+        """Pick the smallest encoding the client accepts: (encoding, ETag, body)."""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.country_list and accept_encodings[encoding]:
+                return (encoding,) + self.country_list[encoding]
+        return ('',) + self.country_list['']
+
+    @timed(STAGE_SECONDS.labels('serialization'))
+    def full_info(self, country):
+        return self.full[id(country)]
+
+    @timed(STAGE_SECONDS.labels('serialization'))
+    def custom_info(self, country, fields):
+        CACHE_LOOKUPS.labels('payload').inc()
+        return self._custom(id(country), tuple(sorted(set(fields))))
+
+    def _render_custom(self, country_id, fields):
+        CACHE_MISSES.labels('payload').inc()
+        return dumps(custom_country_info(self.countries[country_id], fields))
@@ -1,15 +1,22 @@
+import base64
 from datetime import datetime
 import requests 
 from flask import request, jsonify
 from config import Config
 from user_route import auth
 from models import User, UserSearchHistory
+from country_data import countries
+from history_writer import history_writer
+from search_stats import delete_history, top_countries
+from country_payloads import CUSTOM_FIELDS, dumps, json_response
 from app import app, db
 from flask_httpauth import HTTPTokenAuth
+from metrics import STAGE_SECONDS, timed
 
 from app import app
 
 @auth.verify_token
+@timed(STAGE_SECONDS.labels('auth'))
 def verify_token(token):
     return User.verify_auth_token(token)
 
@@ -19,35 +26,32 @@ def verify_token(token):
 @auth.login_required
 def get_country_list():
     try:
-        # Fetching data from the RestCountries API
-        url = "https://restcountries.com/v3.1/all"
-        response = requests.get(url)
-        all_countries = response.json()
-
-        # list of dictionaries containing only country names and capitals
-        country_list = []
-        for country in all_countries:
-            country_info = {
-                'country_name': country.get('name', {}).get('common'),
-                'capital': country.get('capital', [None])[0]
-            }
-            country_list.append(country_info)
+        # Shared in-process copy of the RestCountries data, with the
+        # list of country names and capitals rendered and compressed once per load
+        payloads = countries.index().payloads
 
         # Tracking the user's access to the country list (not individual countries)
         user_id = auth.current_user().id
-        history_entry = UserSearchHistory(
+        history_writer.record(
             user_id=user_id,
             search_type='country_list', 
             viewed_at=datetime.now() 
         )
-        db.session.add(history_entry)
 
-        db.session.commit() 
-
-        return jsonify(country_list), 200
+        encoding, etag, body = payloads.country_list_variant(request.accept_encodings)
+        # Only the variant being served may validate: a cached gzip body must not
+        # be answered with 304 when this client negotiated identity or br
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(body, mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
 
     except Exception as e:
-        db.session.rollback() 
         return jsonify({'error': str(e)}), 500
 
 
@@ -63,53 +67,23 @@ def search_by_capital():
     if not data or 'capital' not in data:
         return jsonify({'error': 'capital is required'}), 400
 
-    capital_name_input = data['capital'].strip().lower()
-
     try:
-        response = requests.get("https://restcountries.com/v3.1/all")
-        response.raise_for_status()
-        all_countries = response.json()
-
         # Match country by capital name (case-insensitive)
-        matched_country = next(
-            (c for c in all_countries
-             if 'capital' in c and isinstance(c['capital'], list) and any(
-                 capital.lower() == capital_name_input for capital in c['capital']
-             )),
-            None
-        )
+        index = countries.index()
+        matched_country = index.find_by_capital(data['capital'])
 
         if not matched_country:
             return jsonify({'error': 'Capital not found'}), 404
 
         # Save search history
-        new_history = UserSearchHistory(
+        history_writer.record(
             user_id=auth.current_user().id,
             country_name=matched_country['name']['common'],
             search_type='search_by_capital'
         )
-        db.session.add(new_history)
-        db.session.commit()
-
-        # Extract specific information about the matched country
-        result = {
-            'country_name': matched_country['name']['common'],
-            'official_name': matched_country['name']['official'],
-            'capital': matched_country.get('capital', [None])[0],
-            'region': matched_country.get('region'),
-            'subregion': matched_country.get('subregion'),
-            'population': matched_country.get('population'),
-            'calling_code': matched_country.get('idd', {}).get('root', '') +
-                            matched_country.get('idd', {}).get('suffixes', [''])[0],
-            'timezones': matched_country.get('timezones', []),
-            'currencies': list(matched_country.get('currencies', {}).values()),
-            'languages': list(matched_country.get('languages', {}).values()),
-            'flag': matched_country.get('flags', {}).get('svg'),
-            'latlng': matched_country.get('latlng', []),
-            'tld': matched_country.get('tld', [])
-        }
 
-        return jsonify(result), 200
+        # Pre-rendered body for the matched country
+        return json_response(index.payloads.full_info(matched_country))
 
     except requests.RequestException as e:
         return jsonify({'error': 'Failed to fetch data from API', 'details': str(e)}), 500
@@ -130,58 +104,29 @@ def get_country_custom_info():
     if not data or 'country_name' not in data:
         return jsonify({'error': 'country_name is required'}), 400
 
-    country_name_input = data['country_name'].strip().lower()
     requested_fields = data.get('fields', [])
 
     try:
-        url = "https://restcountries.com/v3.1/all"
-        response = requests.get(url)
-        all_countries = response.json()
-
-        matched_country = next(
-            (c for c in all_countries 
-             if c.get('name', {}).get('common', '').lower() == country_name_input 
-             or c.get('name', {}).get('official', '').lower() == country_name_input),
-            None
-        )
+        index = countries.index()
+        matched_country = index.find_by_name(data['country_name'])
 
         if not matched_country:
             return jsonify({'error': 'Country not found'}), 404
 
-        result = {
-            'country_name': matched_country.get('name', {}).get('common')
-        }
-
-        field_map = {
-            'capital': lambda c: c.get('capital', [None])[0],
-            'calling_code': lambda c: c.get('idd', {}).get('root', '') + c.get('idd', {}).get('suffixes', [''])[0],
-            'population': lambda c: c.get('population'),
-            'tld': lambda c: c.get('tld', [None])[0],
-            'timezones': lambda c: c.get('timezones', []),
-            'currencies': lambda c: list(c.get('currencies', {}).values()),
-            'flag': lambda c: c.get('flags', {}).get('svg'),
-            'languages': lambda c: list(c.get('languages', {}).values()),
-            'latlng': lambda c: c.get('latlng', [])
-        }
-
         if not requested_fields:
-            requested_fields = list(field_map.keys())
-
-        for field in requested_fields:
-            if field in field_map:
-                result[field] = field_map[field](matched_country)
+            requested_fields = list(CUSTOM_FIELDS.keys())
+        requested_fields = [f for f in requested_fields if isinstance(f, str)]
 
         # Save search to history
-        new_history = UserSearchHistory(
+        history_writer.record(
             user_id=auth.current_user().id,
             country_name=matched_country.get('name', {}).get('common'),
             search_type='custom_info',
             extra_info=','.join(requested_fields)
         )
-        db.session.add(new_history)
-        db.session.commit()
 
-        return jsonify(result), 200
+        fields = [f for f in requested_fields if f in CUSTOM_FIELDS]
+        return json_response(index.payloads.custom_info(matched_country, fields))
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -194,51 +139,183 @@ def search_by_country():
     if not data or 'country_name' not in data:
         return jsonify({'error': 'country_name is required'}), 400
 
-    country_name_input = data['country_name'].strip().lower()
-
     try:
-        response = requests.get("https://restcountries.com/v3.1/all")
-        response.raise_for_status()
-        all_countries = response.json()
-
         # Match by common or official name (case-insensitive)
-        matched_country = next(
-            (c for c in all_countries
-             if c.get('name', {}).get('common', '').lower() == country_name_input or
-                c.get('name', {}).get('official', '').lower() == country_name_input),
-            None
-        )
+        index = countries.index()
+        matched_country = index.find_by_name(data['country_name'])
 
         if not matched_country:
             return jsonify({'error': 'Country not found'}), 404
 
         # Save search history
-        new_history = UserSearchHistory(
+        history_writer.record(
             user_id=auth.current_user().id,
             country_name=matched_country['name']['common'],
             search_type='search_by_country'
         )
-        db.session.add(new_history)
-        db.session.commit()
-
-
-         # Extract specific information
-        result = {
-            'country_name': matched_country['name']['common'],
-            'official_name': matched_country['name']['official'],
-            'capital': matched_country.get('capital', [None])[0],
-            'region': matched_country.get('region'),
-            'subregion': matched_country.get('subregion'),
-            'population': matched_country.get('population'),
-            'calling_code': matched_country.get('idd', {}).get('root', '') +
-                            matched_country.get('idd', {}).get('suffixes', [''])[0],
-            'timezones': matched_country.get('timezones', []),
-            'currencies': list(matched_country.get('currencies', {}).values()),
-            'languages': list(matched_country.get('languages', {}).values()),
-            'flag': matched_country.get('flags', {}).get('svg'),
-            'latlng': matched_country.get('latlng', []),
-            'tld': matched_country.get('tld', [])
-        }
+
+
+        # Pre-rendered body for the matched country
+        return json_response(index.payloads.full_info(matched_country))
+
+    except requests.RequestException as e:
+        return jsonify({'error': 'Failed to fetch data from API', 'details': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': 'Server error', 'details': str(e)}), 500
+
+
+# Look up many countries at once by name or ISO 3166 code (alpha-2 or alpha-3)
+@app.route('/search_by_countries', methods=['POST'])
+@auth.login_required
+def search_by_countries():
+    data = request.get_json()
+    if not data or not isinstance(data.get('countries'), list):
+        return jsonify({'error': 'countries must be a list of names or codes'}), 400
+
+    queries = [q for q in data['countries'] if isinstance(q, str) and q.strip()]
+    if not queries:
+        return jsonify({'error': 'countries must be a list of names or codes'}), 400
+    if len(queries) > 100:
+        return jsonify({'error': 'At most 100 countries per request'}), 400
+
+    try:
+        index = countries.index()
+        matches = []
+        not_found = []
+        for query in queries:
+            matched_country = index.find_by_name_or_code(query)
+            if matched_country:
+                matches.append(matched_country)
+            else:
+                not_found.append(query)
+
+        # Save search history for every match in one insert
+        user_id = auth.current_user().id
+        history_writer.record_many([
+            {'user_id': user_id, 'country_name': c['name']['common'], 'search_type': 'search_by_countries'}
+            for c in matches
+        ])
+
+        # Stitch the pre-rendered bodies together rather than re-encoding them
+        results = b','.join(index.payloads.full_info(c) for c in matches)
+        return json_response(b'{"not_found":' + dumps(not_found) + b',"results":[' + results + b']}')
+
+    except requests.RequestException as e:
+        return jsonify({'error': 'Failed to fetch data from API', 'details': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': 'Server error', 'details': str(e)}), 500
+
+
+# Inverted-index searches: every country sharing a timezone, currency, language or region
+def search_inverted_index(field, index_name, search_type):
+    data = request.get_json()
+    if not isinstance(data, dict) or field not in data:
+        return jsonify({'error': f'{field} is required'}), 400
+    if not isinstance(data[field], str):
+        return jsonify({'error': f'{field} must be a string'}), 400
+
+    query = data[field].strip()
+
+    try:
+        index = countries.index()
+        matched_countries = index.find_all(getattr(index, index_name), query)
+
+        if not matched_countries:
+            return jsonify({'error': f'No country found for this {field}'}), 404
+
+        # Save search history
+        history_writer.record(
+            user_id=auth.current_user().id,
+            search_query=query,
+            search_type=search_type
+        )
+
+        result = [
+            {
+                'country_name': country['name']['common'],
+                'official_name': country['name']['official'],
+                'capital': country.get('capital', [None])[0]
+            }
+            for country in matched_countries
+        ]
+
+        return jsonify(result), 200
+
+    except requests.RequestException as e:
+        return jsonify({'error': 'Failed to fetch data from API', 'details': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': 'Server error', 'details': str(e)}), 500
+
+
+@app.route('/search_by_timezone', methods=['POST'])
+@auth.login_required
+def search_by_timezone():
+    return search_inverted_index('timezone', 'by_timezone', 'timezone')
+
+
+@app.route('/search_by_currency', methods=['POST'])
+@auth.login_required
+def search_by_currency():
+    # Accepts an ISO 4217 code ("EUR") or a currency name ("Euro")
+    return search_inverted_index('currency', 'by_currency', 'currency')
+
+
+@app.route('/search_by_language', methods=['POST'])
+@auth.login_required
+def search_by_language():
+    # Accepts an ISO 639-3 code ("fra") or a language name ("French")
+    return search_inverted_index('language', 'by_language', 'language')
+
+
+@app.route('/search_by_region', methods=['POST'])
+@auth.login_required
+def search_by_region():
+    # Accepts a region ("Europe") or a subregion ("Western Europe")
+    return search_inverted_index('region', 'by_region', 'region')
+
+
+# Countries closest to a point: the k nearest, or all within radius_km
+@app.route('/search_by_location', methods=['POST'])
+@auth.login_required
+def search_by_location():
+    data = request.get_json()
+    if not data or 'lat' not in data or 'lng' not in data:
+        return jsonify({'error': 'lat and lng are required'}), 400
+
+    try:
+        lat, lng = float(data['lat']), float(data['lng'])
+        radius_km = float(data['radius_km']) if 'radius_km' in data else None
+        k = int(data.get('k', 5))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'lat, lng, k and radius_km must be numbers'}), 400
+
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        return jsonify({'error': 'lat must be within [-90, 90] and lng within [-180, 180]'}), 400
+
+    try:
+        geo = countries.index().geo
+        if radius_km is not None:
+            matches = geo.within(lat, lng, radius_km)
+        else:
+            matches = geo.nearest(lat, lng, min(k, 50))
+
+        # Save search history
+        history_writer.record(
+            user_id=auth.current_user().id,
+            search_query=f'{lat},{lng}',
+            search_type='location',
+            extra_info=f'radius_km={radius_km}' if radius_km is not None else f'k={k}'
+        )
+
+        result = [
+            {
+                'country_name': country['name']['common'],
+                'capital': country.get('capital', [None])[0],
+                'latlng': country['latlng'],
+                'distance_km': round(distance, 1)
+            }
+            for country, distance in matches
+        ]
 
         return jsonify(result), 200
 
@@ -248,22 +325,104 @@ def search_by_country():
         return jsonify({'error': 'Server error', 'details': str(e)}), 500
 
 
+# Type-ahead suggestions for country names and capitals.
+# Called on every keystroke, so it is not recorded in the search history.
+@app.route('/autocomplete', methods=['GET'])
+@auth.login_required
+def autocomplete():
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+
+    if not query.strip():
+        return jsonify({'error': 'q is required'}), 400
+
+    try:
+        return jsonify(countries.index().autocomplete.complete(query, limit)), 200
+    except requests.RequestException as e:
+        return jsonify({'error': 'Failed to fetch data from API', 'details': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': 'Server error', 'details': str(e)}), 500
+
+
+# Most searched countries, across all users or for the current user.
+# Served from counters kept up to date as history is written.
+@app.route('/stats/top_countries', methods=['GET'])
+@auth.login_required
+def get_top_countries():
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    history_writer.flush()
+    return jsonify(top_countries(limit)), 200
+
+
+@app.route('/stats/my_top_countries', methods=['GET'])
+@auth.login_required
+def get_my_top_countries():
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    history_writer.flush()
+    return jsonify(top_countries(limit, user_id=auth.current_user().id)), 200
+
+
+def encode_history_cursor(viewed_at, history_id):
+    return base64.urlsafe_b64encode(f'{viewed_at.isoformat()}|{history_id}'.encode()).decode()
+
+
+def decode_history_cursor(cursor):
+    viewed_at, history_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(viewed_at), int(history_id)
+
+
+# Newest first, one page at a time. Pass the X-Next-Cursor header of a page
+# as ?cursor= to get the next one; the header is absent on the last page.
 @app.route('/history', methods=['GET'])
 @auth.login_required
 def get_history():
     user_id = auth.current_user().id
-    history = UserSearchHistory.query.filter_by(user_id=user_id).order_by(UserSearchHistory.viewed_at.desc()).all()
+    history_writer.flush()  # include searches still waiting in the write-behind buffer
+
+    limit = min(request.args.get('limit', app.config['HISTORY_PAGE_SIZE'], type=int), 200)
+    if limit < 1:
+        return jsonify({'error': 'limit must be at least 1'}), 400
+
+    query = db.select(
+        UserSearchHistory.id,
+        UserSearchHistory.country_name,
+        UserSearchHistory.search_query,
+        UserSearchHistory.search_type,
+        UserSearchHistory.viewed_at
+    ).where(UserSearchHistory.user_id == user_id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            viewed_at, history_id = decode_history_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        # A row-value comparison lets SQLite (3.15+) and PostgreSQL seek straight to
+        # the cursor in the (user_id, viewed_at) index; the equivalent OR does not
+        query = query.where(
+            db.tuple_(UserSearchHistory.viewed_at, UserSearchHistory.id) < db.tuple_(viewed_at, history_id)
+        )
+
+    # One extra row tells us whether another page follows
+    rows = db.session.execute(
+        query.order_by(UserSearchHistory.viewed_at.desc(), UserSearchHistory.id.desc()).limit(limit + 1)
+    ).all()
 
     result = [
         {
             'id': item.id,
             'country_name': item.country_name,
+            'search_query': item.search_query,
             'search_type': item.search_type,
             'viewed_at': item.viewed_at
         }
-        for item in history
+        for item in rows[:limit]
     ]
-    return jsonify(result), 200
+    response = jsonify(result)
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        response.headers['X-Next-Cursor'] = encode_history_cursor(last.viewed_at, last.id)
+    return response, 200
 
 
 
@@ -271,12 +430,12 @@ def get_history():
 @auth.login_required
 def delete_history_item(history_id):
     user_id = auth.current_user().id
-    item = UserSearchHistory.query.filter_by(id=history_id, user_id=user_id).first()
+    history_writer.flush()
 
-    if not item:
+    if not delete_history(user_id, history_id):
+        db.session.rollback()
         return jsonify({'error': 'History item not found'}), 404
 
-    db.session.delete(item)
     db.session.commit()
     return jsonify({'message': 'History item deleted'}), 200
 
@@ -284,6 +443,7 @@ def delete_history_item(history_id):
 @auth.login_required
 def clear_history():
     user_id = auth.current_user().id
-    UserSearchHistory.query.filter_by(user_id=user_id).delete()
+    history_writer.flush()
+    delete_history(user_id)
     db.session.commit()
     return jsonify({'message': 'All history cleared'}), 200
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import tempfile
+import time
+import zlib
+
+import click
+import msgpack
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; shared fetches then fall back to one per process
+    fcntl = None
+
+from app import app
+from country_data import fetch_all_countries
+
+
+logger = logging.getLogger(__name__)
+
+# File layout: MAGIC, then a zlib-compressed msgpack map
+# {'created_at': unix time, 'countries': [restcountries records]}
+MAGIC = b'WPCS\x01'
+
+
+def dump_snapshot(all_countries, path):
+    """Write the dataset to `path`, replacing any previous snapshot atomically."""
+    payload = msgpack.packb({'created_at': time.time(), 'countries': all_countries})
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(zlib.compress(payload, 9))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+def load_snapshot(path):
+    """Return (countries, created_at) from a snapshot written by dump_snapshot()."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f'{path} is not a country snapshot')
+    snapshot = msgpack.unpackb(zlib.decompress(data[len(MAGIC):]))
+    return snapshot['countries'], snapshot['created_at']
+
+
+def seed_from_snapshot(dataset, path):
+    """Serve the bundled snapshot until the first real load completes.
+
+    The snapshot is installed as already stale, so the first read starts a
+    background refresh while being answered from the snapshot. If the upstream
+    stays unavailable the snapshot keeps being served.
+    """
+    if not path:
+        return False
+    if not os.path.exists(path):
+        logger.warning('No country snapshot at %s; cold starts wait on restcountries. '
+                       'Build one with `flask snapshot-countries` when deploying.', path)
+        return False
+    started = time.perf_counter()
+    try:
+        all_countries, created_at = load_snapshot(path)
+    except (OSError, ValueError, zlib.error, msgpack.UnpackException):
+        logger.exception('Ignoring unreadable country snapshot %s', path)
+        return False
+    dataset.seed(all_countries)
+    logger.info('Loaded %d countries from snapshot %s (created %s) in %.1f ms',
+                len(all_countries), path, time.strftime('%Y-%m-%d %H:%M', time.gmtime(created_at)),
+                (time.perf_counter() - started) * 1000)
+    return True
+
+
+class SharedFetch:
+    """Dataset loader that lets the worker processes on one host share a fetch.
+
+    A process takes an exclusive lock on `<directory>/countries.lock` before
+    calling `fetch` and leaves the result next to it in the snapshot format.
+    Processes that were waiting on the lock find a result younger than
+    `share_window` seconds and load that instead of calling the upstream again.
+    """
+
+    def __init__(self, fetch, directory, share_window=60):
+        self.fetch = fetch
+        self.share_window = share_window
+        self.lock_path = os.path.join(directory, 'countries.lock')
+        self.result_path = os.path.join(directory, 'countries.snapshot')
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self):
+        if fcntl is None:
+            return self.fetch()
+
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                shared = self._recent_result()
+                if shared is not None:
+                    return shared
+                all_countries = self.fetch()
+                dump_snapshot(all_countries, self.result_path)
+                return all_countries
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _recent_result(self):
+        try:
+            if time.time() - os.path.getmtime(self.result_path) > self.share_window:
+                return None
+            return load_snapshot(self.result_path)[0]
+        except (OSError, ValueError, zlib.error, msgpack.UnpackException):
+            return None
+
+
+@app.cli.command('snapshot-countries')
+@click.option('--file', 'path', type=click.Path(exists=True, dir_okay=False),
+              help='Build the snapshot from a local restcountries JSON file instead of the API.')
+@click.option('--output', default=None,
+              help='Where to write the snapshot (defaults to COUNTRY_SNAPSHOT_PATH).')
+@click.option('--check', is_flag=True,
+              help='Only verify the snapshot exists and loads; exits non-zero otherwise.')
+def snapshot_countries_command(path, output, check):
+    """Refresh the offline country snapshot loaded at startup.
+
+    The snapshot is not kept in the repository: run this as a build or deploy
+    step, then `flask snapshot-countries --check` to fail the build without one.
+    """
+    output = output or app.config['COUNTRY_SNAPSHOT_PATH']
+    if check:
+        try:
+            all_countries, created_at = load_snapshot(output)
+        except (OSError, ValueError, zlib.error, msgpack.UnpackException) as e:
+            raise click.ClickException(f'No usable country snapshot at {output}: {e}')
+        if not all_countries:
+            raise click.ClickException(f'The country snapshot at {output} is empty')
+        click.echo(f'{output}: {len(all_countries)} countries, created '
+                   f'{time.strftime("%Y-%m-%d %H:%M", time.gmtime(created_at))} UTC')
+        return
+
+    if path:
+        with open(path, encoding='utf-8') as f:
+            all_countries = json.load(f)
+    else:
+        all_countries = fetch_all_countries()
+
+    size = dump_snapshot(all_countries, output)
+    started = time.perf_counter()
+    load_snapshot(output)
+    click.echo(f'Wrote {len(all_countries)} countries to {output} ({size} bytes, '
+               f'loads in {(time.perf_counter() - started) * 1000:.1f} ms)')
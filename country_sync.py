@@ -0,0 +1,138 @@
+import json
+
+import click
+
+from app import app, db
+from country_data import fetch_all_countries
+from models import Country, CountryCurrency, CountryLanguage, CountryTimezone
+
+
+def country_row(country):
+    """Flatten one restcountries record into Country column values."""
+    idd = country.get('idd', {})
+    capitals = country.get('capital') or []
+    return {
+        'name': country['name']['common'],
+        'official_name': country['name'].get('official'),
+        'cca2': country.get('cca2'),
+        'cca3': country.get('cca3'),
+        'region': country.get('region'),
+        'subregion': country.get('subregion'),
+        'capital': capitals[0] if capitals else None,
+        'capitals': capitals,
+        'alt_spellings': country.get('altSpellings', []),
+        'calling_code': idd.get('root', '') + (idd.get('suffixes') or [''])[0],
+        'population': country.get('population'),
+        'tld': country.get('tld', []),
+        'timezones': country.get('timezones', []),
+        'currencies': country.get('currencies', {}),
+        'flag': country.get('flags', {}).get('svg'),
+        'languages': country.get('languages', {}),
+        'latlng': country.get('latlng', []),
+    }
+
+
+def country_record(row):
+    """Rebuild the restcountries shape the country routes work with."""
+    record = {
+        'name': {'common': row.name, 'official': row.official_name},
+        'cca2': row.cca2,
+        'cca3': row.cca3,
+        'region': row.region,
+        'subregion': row.subregion,
+        'altSpellings': row.alt_spellings or [],
+        'idd': {'root': row.calling_code or '', 'suffixes': ['']},
+        'population': row.population,
+        'tld': row.tld or [],
+        'timezones': row.timezones or [],
+        'currencies': row.currencies or {},
+        'flags': {'svg': row.flag},
+        'languages': row.languages or {},
+        'latlng': row.latlng or [],
+    }
+    # restcountries omits the key for territories without a capital
+    if row.capitals:
+        record['capital'] = row.capitals
+    return record
+
+
+def child_rows(rows, ids):
+    """Normalized timezone, currency and language rows for the synced countries."""
+    timezone_rows, currency_rows, language_rows = [], [], []
+    for name, row in rows.items():
+        country_id = ids[name]
+        for timezone in row['timezones']:
+            timezone_rows.append({'country_id': country_id, 'timezone': timezone})
+        for code, currency in row['currencies'].items():
+            currency_rows.append({'country_id': country_id, 'code': code,
+                                  'name': currency.get('name'), 'symbol': currency.get('symbol')})
+        for code, language in row['languages'].items():
+            language_rows.append({'country_id': country_id, 'code': code, 'name': language})
+    return timezone_rows, currency_rows, language_rows
+
+
+def sync_countries(all_countries):
+    """Upsert the restcountries payload into the Country table in one transaction.
+
+    Countries missing from the payload are removed. Returns a dict with the
+    number of inserted, updated and deleted rows.
+    """
+    rows = {}
+    for country in all_countries:
+        row = country_row(country)
+        rows[row['name']] = row
+
+    existing = dict(db.session.execute(db.select(Country.name, Country.id)).all())
+
+    inserts = [row for name, row in rows.items() if name not in existing]
+    updates = [dict(row, id=existing[name]) for name, row in rows.items() if name in existing]
+    stale_ids = [country_id for name, country_id in existing.items() if name not in rows]
+
+    try:
+        # Child rows are derived data, so they are rebuilt wholesale for every sync
+        for child in (CountryTimezone, CountryCurrency, CountryLanguage):
+            db.session.execute(db.delete(child))
+
+        if inserts:
+            db.session.execute(db.insert(Country), inserts)
+        if updates:
+            db.session.execute(db.update(Country), updates)
+        if stale_ids:
+            db.session.execute(db.delete(Country).where(Country.id.in_(stale_ids)))
+
+        ids = dict(db.session.execute(db.select(Country.name, Country.id)).all())
+        timezone_rows, currency_rows, language_rows = child_rows(rows, ids)
+        if timezone_rows:
+            db.session.execute(db.insert(CountryTimezone), timezone_rows)
+        if currency_rows:
+            db.session.execute(db.insert(CountryCurrency), currency_rows)
+        if language_rows:
+            db.session.execute(db.insert(CountryLanguage), language_rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {'inserted': len(inserts), 'updated': len(updates), 'deleted': len(stale_ids)}
+
+
+def load_countries_from_db():
+    """Dataset loader that serves the country routes from the local Country table."""
+    with app.app_context():
+        return [country_record(row) for row in Country.query.order_by(Country.id).all()]
+
+
+@app.cli.command('sync-countries')
+@click.option('--file', 'path', type=click.Path(exists=True, dir_okay=False),
+              help='Load countries from a local restcountries JSON file instead of the API.')
+def sync_countries_command(path):
+    """Copy the restcountries dataset into the Country table."""
+    if path:
+        with open(path, encoding='utf-8') as f:
+            all_countries = json.load(f)
+    else:
+        all_countries = fetch_all_countries()
+
+    counts = sync_countries(all_countries)
+    click.echo(f"Countries synced: {counts['inserted']} inserted, "
+               f"{counts['updated']} updated, {counts['deleted']} deleted")
@@ -0,0 +1,25 @@
+import sqlite3
+
+from sqlalchemy import event
+
+
+def configure_sqlite(engine, journal_mode='WAL', synchronous='NORMAL', busy_timeout=5000, mmap_size=0):
+    """Apply the pragmas to every connection the engine opens, if it is SQLite.
+
+    WAL lets readers run alongside the single writer, and busy_timeout makes
+    a writer wait for the lock instead of failing with "database is locked".
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        if engine.url.database not in (None, '', ':memory:'):
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            cursor.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        cursor.execute(f'PRAGMA synchronous={synchronous}')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cursor.close()
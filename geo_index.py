@@ -0,0 +1,48 @@
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class GeoIndex:
+    """Country coordinates packed into arrays for vectorized distance queries.
+
+    Every query computes the haversine distance to all countries at once,
+    which for ~250 points is a handful of array operations.
+    """
+
+    def __init__(self, countries):
+        located = [c for c in countries if len(c.get('latlng') or []) == 2]
+        self.countries = located
+
+        coordinates = np.radians(np.array([c['latlng'] for c in located], dtype=np.float64).reshape(-1, 2))
+        self.lat = coordinates[:, 0]
+        self.lng = coordinates[:, 1]
+        self.cos_lat = np.cos(self.lat)
+
+    def distances(self, lat, lng):
+        """Great-circle distance in km from (lat, lng) to every country."""
+        lat, lng = np.radians(lat), np.radians(lng)
+        half_dlat = np.sin((self.lat - lat) / 2)
+        half_dlng = np.sin((self.lng - lng) / 2)
+        a = half_dlat ** 2 + np.cos(lat) * self.cos_lat * half_dlng ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def nearest(self, lat, lng, k=5):
+        """The k closest countries as (country, distance_km), closest first."""
+        if not self.countries or k <= 0:
+            return []
+        distances = self.distances(lat, lng)
+        k = min(k, len(distances))
+        closest = np.argpartition(distances, k - 1)[:k]
+        closest = closest[np.argsort(distances[closest])]
+        return [(self.countries[i], float(distances[i])) for i in closest]
+
+    def within(self, lat, lng, radius_km):
+        """Every country within radius_km as (country, distance_km), closest first."""
+        if not self.countries:
+            return []
+        distances = self.distances(lat, lng)
+        inside = np.flatnonzero(distances <= radius_km)
+        inside = inside[np.argsort(distances[inside])]
+        return [(self.countries[i], float(distances[i])) for i in inside]
@@ -0,0 +1,147 @@
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app import app, db
+from metrics import HISTORY_ROWS, STAGE_SECONDS, timed
+from models import UserSearchHistory
+from search_stats import record_counts
+
+
+logger = logging.getLogger(__name__)
+
+# Length of each bounded string column; longer values are cut to fit at record time
+COLUMN_LENGTHS = {column.name: column.type.length for column in UserSearchHistory.__table__.columns
+                  if isinstance(column.type, db.String) and column.type.length}
+
+
+class HistoryWriter:
+    """Write-behind buffer for UserSearchHistory rows.
+
+    Routes call record() and return without waiting for a commit. A background
+    thread inserts the buffered rows in one multi-row INSERT every
+    `flush_interval` seconds, or sooner once `flush_size` rows are waiting. At
+    most `max_pending` rows are ever held in memory: when the buffer is full the
+    caller flushes inline, which bounds what a crash can lose. Whatever is left
+    is flushed at interpreter exit.
+
+    When a batch fails its rows are retried one at a time. A row the database
+    rejects is logged and dropped, so it cannot hold up the rows behind it.
+    Connection errors keep the rest buffered for the next flush.
+    """
+
+    def __init__(self, flush_size=100, flush_interval=1.0, max_pending=1000, enabled=True):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def record(self, **fields):
+        self.record_many([fields])
+
+    def record_many(self, rows):
+        now = datetime.now()
+        for row in rows:
+            row.setdefault('viewed_at', now)
+            for name, length in COLUMN_LENGTHS.items():
+                value = row.get(name)
+                if isinstance(value, str) and len(value) > length:
+                    row[name] = value[:length]
+
+        if not self.enabled:
+            self._insert(rows)
+            return
+
+        with self._lock:
+            self._pending.extend(rows)
+            pending = len(self._pending)
+        self._ensure_started()
+
+        if pending >= self.max_pending:
+            self.flush()
+        elif pending >= self.flush_size:
+            self._wake.set()
+
+    def flush(self):
+        """Insert everything buffered so far; safe to call from any thread."""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._pending)
+                self._pending.clear()
+            if not rows:
+                return
+            try:
+                self._insert(rows)
+            except Exception:
+                logger.exception('Failed to write %d search history rows, retrying them one by one', len(rows))
+                self._requeue(self._insert_one_by_one(rows))
+
+    def _insert_one_by_one(self, rows):
+        """Insert rows singly, dropping the ones the database rejects; returns the rows left unwritten."""
+        for i, row in enumerate(rows):
+            try:
+                self._insert([row])
+            except (OperationalError, InterfaceError):
+                logger.exception('Database unavailable, keeping %d search history rows buffered', len(rows) - i)
+                return rows[i:]
+            except Exception:
+                logger.exception('Dropping search history row %r', row)
+        return []
+
+    def _requeue(self, rows):
+        with self._lock:
+            room = self.max_pending - len(self._pending)
+            if room > 0:
+                self._pending.extendleft(reversed(rows[-room:]))
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+    @timed(STAGE_SECONDS.labels('history_commit'))
+    def _insert(self, rows):
+        with app.app_context():
+            try:
+                db.session.execute(db.insert(UserSearchHistory), rows)
+                record_counts(rows)
+                db.session.commit()
+                HISTORY_ROWS.inc(len(rows))
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+history_writer = HistoryWriter(
+    flush_size=app.config['HISTORY_FLUSH_SIZE'],
+    flush_interval=app.config['HISTORY_FLUSH_INTERVAL'],
+    max_pending=app.config['HISTORY_MAX_PENDING'],
+    enabled=app.config['HISTORY_WRITE_BEHIND']
+)
@@ -0,0 +1,168 @@
+import atexit
+import logging
+import queue
+import random
+import smtplib
+import threading
+import uuid
+from collections import OrderedDict
+
+from app import app, mail
+
+
+logger = logging.getLogger(__name__)
+
+
+class MailJob:
+    def __init__(self, message):
+        self.id = uuid.uuid4().hex
+        self.message = message
+        self.status = 'queued'  # queued -> sent | retrying -> ... -> sent | failed
+        self.attempts = 0
+        self.error = None
+
+    def as_dict(self):
+        return {'id': self.id, 'status': self.status, 'attempts': self.attempts, 'error': self.error}
+
+
+class MailQueue:
+    """Outbound mail sent by background workers over long-lived SMTP connections.
+
+    Each worker keeps one connection open and sends whatever is waiting (up to
+    `batch_size` messages) over it, closing it after `idle_timeout` seconds
+    without mail. A failed send drops the connection and is retried up to
+    `max_retries` times with exponential backoff and jitter.
+    """
+
+    def __init__(self, workers=1, batch_size=20, max_retries=3, retry_backoff=2.0,
+                 idle_timeout=30, history_size=1000):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self.history_size = history_size
+        self.counts = {'sent': 0, 'failed': 0, 'retried': 0}
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def enqueue(self, message):
+        """Queue a flask_mail Message and return its job id straight away."""
+        job = MailJob(message)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history_size:
+                self._jobs.popitem(last=False)
+        self._ensure_started()
+        self._queue.put(job)
+        return job.id
+
+    def status(self, job_id=None):
+        if job_id is not None:
+            job = self._jobs.get(job_id)
+            return job.as_dict() if job else None
+        with self._lock:
+            counts = dict(self.counts)
+        return dict(counts, queued=self._queue.qsize(), workers=len(self._threads))
+
+    def stop(self, timeout=10):
+        """Let the workers drain what is already queued, then close their connections."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if not self._threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f'mail-worker-{i}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+                atexit.register(self.stop)
+
+    def _run(self):
+        connection = None
+        with app.app_context():
+            while True:
+                try:
+                    job = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    connection = self._close(connection)
+                    continue
+
+                if job is None:  # stop() queues one None per worker behind the real mail
+                    self._close(connection)
+                    return
+
+                batch = [job]
+                while len(batch) < self.batch_size:
+                    try:
+                        job = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(job)
+
+                for job in batch:
+                    connection = self._deliver(connection, job)
+
+    def _deliver(self, connection, job):
+        job.attempts += 1
+        try:
+            if connection is None:
+                connection = mail.connect().__enter__()
+            connection.send(job.message)
+        except (smtplib.SMTPException, OSError) as e:
+            self._close(connection)
+            self._failed(job, e)
+            return None
+        except Exception as e:
+            # Not a delivery problem (bad headers, no recipients): retrying won't help
+            self._failed(job, e, retry=False)
+            return connection
+
+        job.status = 'sent'
+        with self._lock:
+            self.counts['sent'] += 1
+        return connection
+
+    def _failed(self, job, error, retry=True):
+        job.error = str(error)
+        with self._lock:
+            if not retry or job.attempts > self.max_retries:
+                job.status = 'failed'
+                self.counts['failed'] += 1
+                logger.error('Giving up on email %s after %d attempts: %s', job.id, job.attempts, error)
+                return
+            job.status = 'retrying'
+            self.counts['retried'] += 1
+
+        delay = self.retry_backoff * 2 ** (job.attempts - 1) * random.uniform(0.5, 1.5)
+        timer = threading.Timer(delay, self._queue.put, args=[job])
+        timer.daemon = True
+        timer.start()
+
+    @staticmethod
+    def _close(connection):
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+        return None
+
+
+mail_queue = MailQueue(
+    workers=app.config['MAIL_QUEUE_WORKERS'],
+    batch_size=app.config['MAIL_QUEUE_BATCH_SIZE'],
+    max_retries=app.config['MAIL_QUEUE_MAX_RETRIES'],
+    retry_backoff=app.config['MAIL_QUEUE_RETRY_BACKOFF'],
+    idle_timeout=app.config['MAIL_QUEUE_IDLE_TIMEOUT']
+)
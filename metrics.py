@@ -0,0 +1,217 @@
+import abc
+import bisect
+import functools
+import threading
+import time
+
+
+# Upper bounds (seconds) shared by the latency histograms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """The metrics of this process, rendered in the Prometheus text format (0.0.4)."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class Metric(abc.ABC):
+    """A metric with one child per label value tuple; subclasses say what a child is."""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=registry):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        registry.register(self)
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self):
+        for values, child in sorted(self._children.items()):
+            yield from child.samples(self.name, self.labelnames, values)
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """A fresh child holding the value(s) for one label value tuple."""
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labelnames, values):
+        yield f'{name}{format_labels(labelnames, values)} {format_value(self.value)}'
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # per bucket, the last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self)
+
+    def samples(self, name, labelnames, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield f'{name}_bucket{format_labels(labelnames, values, [("le", format_value(bound))])} {cumulative}'
+        yield f'{name}_sum{format_labels(labelnames, values)} {format_value(total)}'
+        yield f'{name}_count{format_labels(labelnames, values)} {cumulative}'
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=registry):
+        self.buckets = tuple(float(b) for b in buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def time(self):
+        return self._children[()].time()
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+class Callback:
+    """A gauge or counter read from `function` at scrape time.
+
+    `function` returns a number, or a dict of label value tuples -> number.
+    It holds no values of its own, so unlike Metric it has no children.
+    """
+
+    def __init__(self, name, documentation, function, type='gauge', labelnames=(), registry=registry):
+        self.function = function
+        self.type = type
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def samples(self):
+        value = self.function()
+        values = value if isinstance(value, dict) else {(): value}
+        for labels, number in sorted(values.items()):
+            yield f'{self.name}{format_labels(self.labelnames, labels)} {format_value(number)}'
+
+
+def timed(histogram):
+    """Decorator observing each call's duration on a histogram (or histogram child)."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+REQUEST_SECONDS = Histogram(
+    'worldpeek_request_duration_seconds', 'Time from the start of a request to its response.',
+    ['endpoint', 'method', 'status'])
+STAGE_SECONDS = Histogram(
+    'worldpeek_stage_duration_seconds',
+    'Time spent in one stage of handling a request (auth, upstream_fetch, match, serialization, ...).',
+    ['stage'])
+REQUEST_DB_QUERIES = Histogram(
+    'worldpeek_request_db_queries', 'SQL statements executed while handling one request.',
+    ['endpoint'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+DB_QUERIES = Counter('worldpeek_db_queries_total', 'SQL statements executed, including background work.')
+UPSTREAM_REQUESTS = Counter('worldpeek_upstream_requests_total', 'HTTP requests made to restcountries.', ['status'])
+UPSTREAM_BYTES = Counter('worldpeek_upstream_response_bytes_total', 'Response body bytes received from restcountries.')
+CACHE_LOOKUPS = Counter('worldpeek_cache_lookups_total', 'Lookups per in-process cache.', ['cache'])
+CACHE_MISSES = Counter('worldpeek_cache_misses_total', 'Lookups per in-process cache that missed.', ['cache'])
+HISTORY_ROWS = Counter('worldpeek_history_rows_written_total', 'Search history rows committed by the writer.')
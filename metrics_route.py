@@ -0,0 +1,63 @@
+import hmac
+import logging
+import time
+
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+
+from app import app, db
+from country_data import countries
+from mail_queue import mail_queue
+from metrics import Callback, DB_QUERIES, REQUEST_DB_QUERIES, REQUEST_SECONDS, registry
+
+
+logger = logging.getLogger(__name__)
+
+
+Callback('worldpeek_mail_queue_depth', 'Emails waiting for a mail worker.',
+         lambda: mail_queue.status()['queued'])
+Callback('worldpeek_mail_jobs_total', 'Emails by delivery outcome.',
+         lambda: {(outcome,): count for outcome, count in mail_queue.status().items()
+                  if outcome in ('sent', 'failed', 'retried')},
+         type='counter', labelnames=['outcome'])
+Callback('worldpeek_country_dataset_loads_total', 'Country datasets loaded into this process.',
+         lambda: countries.version, type='counter')
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    DB_QUERIES.inc()
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+
+
+if app.config['METRICS_ENABLED']:
+    if not app.config['METRICS_TOKEN']:
+        logger.warning('/metrics is enabled without METRICS_TOKEN and is readable by anyone')
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_query)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_SECONDS.labels(endpoint, request.method, response.status_code) \
+                .observe(time.perf_counter() - started)
+            REQUEST_DB_QUERIES.labels(endpoint).observe(g.pop('db_queries', 0))
+        return response
+
+
+# Prometheus scrape endpoint, requiring `Authorization: Bearer <METRICS_TOKEN>` when a token is set
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Not found'}), 404
+    token = app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token):
+        return jsonify({'error': 'Unauthorized access'}), 401
+    return app.response_class(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -31,7 +31,7 @@ def downgrade():
     # ### commands auto generated by Alembic - please adjust! ###
     with op.batch_alter_table('user_search_history', schema=None) as batch_op:
         batch_op.add_column(sa.Column('query', sa.VARCHAR(length=256), nullable=True))
-        batch_op.add_column(sa.Column('timestamp', sa.DATETIME(), nullable=True))
+        batch_op.add_column(sa.Column('timestamp', sa.DateTime(), nullable=True))
         batch_op.drop_column('viewed_at')
         batch_op.drop_column('search_query')
 
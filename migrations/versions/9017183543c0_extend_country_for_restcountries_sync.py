@@ -0,0 +1,73 @@
+"""Extend Country for restcountries sync
+
+Revision ID: 9017183543c0
+Revises: 2e0e2d30ab2b
+Create Date: 2026-10-18 09:30:12.481203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9017183543c0'
+down_revision = '2e0e2d30ab2b'
+branch_labels = None
+depends_on = None
+
+
+def _country_tld(tld_type):
+    return sa.table('country', sa.column('id', sa.Integer()), sa.column('tld', tld_type))
+
+
+def _replace_tld(old_type, new_type, convert):
+    """Swap the type of country.tld, converting each stored value in Python.
+
+    There is no SQL cast between a plain string and a pickled list, so the
+    values are read out, the column is dropped and re-added, and written back.
+    """
+    bind = op.get_bind()
+    old_table = _country_tld(old_type)
+    rows = bind.execute(sa.select(old_table.c.id, old_table.c.tld)).all()
+
+    with op.batch_alter_table('country', schema=None) as batch_op:
+        batch_op.drop_column('tld')
+    with op.batch_alter_table('country', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tld', new_type, nullable=True))
+
+    new_table = _country_tld(new_type)
+    for row_id, tld in rows:
+        if tld is not None:
+            bind.execute(new_table.update().where(new_table.c.id == row_id).values(tld=convert(tld)))
+
+
+def upgrade():
+    with op.batch_alter_table('country', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('official_name', sa.String(length=256), nullable=True))
+        batch_op.add_column(sa.Column('cca2', sa.String(length=2), nullable=True))
+        batch_op.add_column(sa.Column('cca3', sa.String(length=3), nullable=True))
+        batch_op.add_column(sa.Column('region', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('subregion', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('capitals', sa.PickleType(), nullable=True))
+        batch_op.add_column(sa.Column('alt_spellings', sa.PickleType(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_country_cca2'), ['cca2'], unique=False)
+        batch_op.create_index(batch_op.f('ix_country_cca3'), ['cca3'], unique=False)
+
+    # A single top-level domain becomes a one-item list
+    _replace_tld(sa.String(length=10), sa.PickleType(), lambda tld: [tld])
+
+
+def downgrade():
+    # Keep the first top-level domain, as the column held before
+    _replace_tld(sa.PickleType(), sa.String(length=10), lambda tlds: tlds[0][:10] if tlds else None)
+
+    with op.batch_alter_table('country', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_country_cca3'))
+        batch_op.drop_index(batch_op.f('ix_country_cca2'))
+        batch_op.drop_column('alt_spellings')
+        batch_op.drop_column('capitals')
+        batch_op.drop_column('subregion')
+        batch_op.drop_column('region')
+        batch_op.drop_column('cca3')
+        batch_op.drop_column('cca2')
+        batch_op.drop_column('official_name')
@@ -44,11 +44,13 @@ def upgrade():
         batch_op.alter_column('timezones',
                existing_type=sa.VARCHAR(length=200),
                type_=sa.PickleType(),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using='timezones::bytea')
         batch_op.alter_column('currencies',
                existing_type=sa.VARCHAR(length=200),
                type_=sa.PickleType(),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using='currencies::bytea')
         batch_op.alter_column('flag',
                existing_type=sa.VARCHAR(length=300),
                type_=sa.String(length=256),
@@ -56,12 +58,14 @@ def upgrade():
         batch_op.alter_column('languages',
                existing_type=sa.VARCHAR(length=200),
                type_=sa.PickleType(),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using='languages::bytea')
         batch_op.alter_column('latlng',
                existing_type=sa.VARCHAR(length=50),
                type_=sa.PickleType(),
-               existing_nullable=True)
-        batch_op.create_unique_constraint(None, ['name'])
+               existing_nullable=True,
+               postgresql_using='latlng::bytea')
+        batch_op.create_unique_constraint('uq_country_name', ['name'])
         batch_op.drop_column('created_at')
         batch_op.drop_column('country_name')
 
@@ -72,16 +76,18 @@ def downgrade():
     # ### commands auto generated by Alembic - please adjust! ###
     with op.batch_alter_table('country', schema=None) as batch_op:
         batch_op.add_column(sa.Column('country_name', sa.VARCHAR(length=100), nullable=False))
-        batch_op.add_column(sa.Column('created_at', sa.DATETIME(), nullable=True))
-        batch_op.drop_constraint(None, type_='unique')
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.drop_constraint('uq_country_name', type_='unique')
         batch_op.alter_column('latlng',
                existing_type=sa.PickleType(),
                type_=sa.VARCHAR(length=50),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using="encode(latlng, 'escape')")
         batch_op.alter_column('languages',
                existing_type=sa.PickleType(),
                type_=sa.VARCHAR(length=200),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using="encode(languages, 'escape')")
         batch_op.alter_column('flag',
                existing_type=sa.String(length=256),
                type_=sa.VARCHAR(length=300),
@@ -89,11 +95,13 @@ def downgrade():
         batch_op.alter_column('currencies',
                existing_type=sa.PickleType(),
                type_=sa.VARCHAR(length=200),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using="encode(currencies, 'escape')")
         batch_op.alter_column('timezones',
                existing_type=sa.PickleType(),
                type_=sa.VARCHAR(length=200),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using="encode(timezones, 'escape')")
         batch_op.alter_column('population',
                existing_type=sa.Integer(),
                type_=sa.BIGINT(),
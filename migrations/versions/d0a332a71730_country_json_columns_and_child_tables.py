@@ -0,0 +1,130 @@
+"""Store Country lists as JSON and add indexed timezone/currency/language tables
+
+Revision ID: d0a332a71730
+Revises: 9017183543c0
+Create Date: 2026-10-18 10:02:47.115934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0a332a71730'
+down_revision = '9017183543c0'
+branch_labels = None
+depends_on = None
+
+
+CONVERTED_COLUMNS = ['capitals', 'alt_spellings', 'tld', 'timezones', 'currencies', 'languages', 'latlng']
+
+
+def _country_table(column_type):
+    return sa.table('country', sa.column('id', sa.Integer),
+                    *[sa.column(name, column_type) for name in CONVERTED_COLUMNS])
+
+
+def _replace_columns(old_type, new_type):
+    """Swap the type of CONVERTED_COLUMNS, carrying the values across.
+
+    Dropping and re-adding keeps this portable: PostgreSQL cannot cast bytea
+    to json in place.
+    """
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(_country_table(old_type))).mappings().all()
+
+    with op.batch_alter_table('country', schema=None) as batch_op:
+        for name in CONVERTED_COLUMNS:
+            batch_op.drop_column(name)
+    with op.batch_alter_table('country', schema=None) as batch_op:
+        for name in CONVERTED_COLUMNS:
+            batch_op.add_column(sa.Column(name, new_type, nullable=True))
+
+    new_table = _country_table(new_type)
+    for row in rows:
+        bind.execute(new_table.update().where(new_table.c.id == row['id'])
+                     .values({name: row[name] for name in CONVERTED_COLUMNS}))
+    return rows
+
+
+def upgrade():
+    rows = _replace_columns(sa.PickleType(), sa.JSON())
+
+    op.create_table('country_timezone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('country_id', sa.Integer(), nullable=False),
+    sa.Column('timezone', sa.String(length=16), nullable=False),
+    sa.ForeignKeyConstraint(['country_id'], ['country.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('country_timezone', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_country_timezone_country_id'), ['country_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_country_timezone_timezone'), ['timezone'], unique=False)
+
+    op.create_table('country_currency',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('country_id', sa.Integer(), nullable=False),
+    sa.Column('code', sa.String(length=3), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=True),
+    sa.Column('symbol', sa.String(length=16), nullable=True),
+    sa.ForeignKeyConstraint(['country_id'], ['country.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('country_currency', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_country_currency_country_id'), ['country_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_country_currency_code'), ['code'], unique=False)
+
+    op.create_table('country_language',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('country_id', sa.Integer(), nullable=False),
+    sa.Column('code', sa.String(length=3), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.ForeignKeyConstraint(['country_id'], ['country.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('country_language', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_country_language_country_id'), ['country_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_country_language_code'), ['code'], unique=False)
+        batch_op.create_index(batch_op.f('ix_country_language_name'), ['name'], unique=False)
+
+    # Backfill the child tables from whatever was already synced
+    timezone_rows, currency_rows, language_rows = [], [], []
+    for row in rows:
+        for timezone in row['timezones'] or []:
+            timezone_rows.append({'country_id': row['id'], 'timezone': timezone})
+        for code, currency in (row['currencies'] or {}).items():
+            currency_rows.append({'country_id': row['id'], 'code': code,
+                                  'name': currency.get('name'), 'symbol': currency.get('symbol')})
+        for code, language in (row['languages'] or {}).items():
+            language_rows.append({'country_id': row['id'], 'code': code, 'name': language})
+
+    if timezone_rows:
+        op.bulk_insert(sa.table('country_timezone', sa.column('country_id', sa.Integer),
+                                sa.column('timezone', sa.String)), timezone_rows)
+    if currency_rows:
+        op.bulk_insert(sa.table('country_currency', sa.column('country_id', sa.Integer),
+                                sa.column('code', sa.String), sa.column('name', sa.String),
+                                sa.column('symbol', sa.String)), currency_rows)
+    if language_rows:
+        op.bulk_insert(sa.table('country_language', sa.column('country_id', sa.Integer),
+                                sa.column('code', sa.String), sa.column('name', sa.String)), language_rows)
+
+
+def downgrade():
+    with op.batch_alter_table('country_language', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_country_language_name'))
+        batch_op.drop_index(batch_op.f('ix_country_language_code'))
+        batch_op.drop_index(batch_op.f('ix_country_language_country_id'))
+    op.drop_table('country_language')
+
+    with op.batch_alter_table('country_currency', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_country_currency_code'))
+        batch_op.drop_index(batch_op.f('ix_country_currency_country_id'))
+    op.drop_table('country_currency')
+
+    with op.batch_alter_table('country_timezone', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_country_timezone_timezone'))
+        batch_op.drop_index(batch_op.f('ix_country_timezone_country_id'))
+    op.drop_table('country_timezone')
+
+    _replace_columns(sa.JSON(), sa.PickleType())
@@ -16,7 +16,16 @@ branch_labels = None
 depends_on = None
 
 
+def _country_columns():
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns('country')}
+
+
 def upgrade():
+    # Only databases that missed 940ad01e65d3 still have the old columns;
+    # on a database built from scratch there is nothing to re-align.
+    if 'country_name' not in _country_columns():
+        return
+
     # ### commands auto generated by Alembic - please adjust! ###
     with op.batch_alter_table('country', schema=None) as batch_op:
         batch_op.add_column(sa.Column('name', sa.String(length=128), nullable=False))
@@ -35,11 +44,13 @@ def upgrade():
         batch_op.alter_column('timezones',
                existing_type=sa.VARCHAR(length=200),
                type_=sa.PickleType(),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using='timezones::bytea')
         batch_op.alter_column('currencies',
                existing_type=sa.VARCHAR(length=200),
                type_=sa.PickleType(),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using='currencies::bytea')
         batch_op.alter_column('flag',
                existing_type=sa.VARCHAR(length=300),
                type_=sa.String(length=256),
@@ -47,11 +58,13 @@ def upgrade():
         batch_op.alter_column('languages',
                existing_type=sa.VARCHAR(length=200),
                type_=sa.PickleType(),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using='languages::bytea')
         batch_op.alter_column('latlng',
                existing_type=sa.VARCHAR(length=50),
                type_=sa.PickleType(),
-               existing_nullable=True)
+               existing_nullable=True,
+               postgresql_using='latlng::bytea')
         batch_op.create_unique_constraint("uq_country_name", ['name'])
         batch_op.drop_column('created_at')
         batch_op.drop_column('country_name')
@@ -60,43 +73,6 @@ def upgrade():
 
 
 def downgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    with op.batch_alter_table('country', schema=None) as batch_op:
-        batch_op.add_column(sa.Column('country_name', sa.VARCHAR(length=100), nullable=False))
-        batch_op.add_column(sa.Column('created_at', sa.DATETIME(), nullable=True))
-        batch_op.drop_constraint(None, type_='unique')
-        batch_op.alter_column('latlng',
-               existing_type=sa.PickleType(),
-               type_=sa.VARCHAR(length=50),
-               existing_nullable=True)
-        batch_op.alter_column('languages',
-               existing_type=sa.PickleType(),
-               type_=sa.VARCHAR(length=200),
-               existing_nullable=True)
-        batch_op.alter_column('flag',
-               existing_type=sa.String(length=256),
-               type_=sa.VARCHAR(length=300),
-               existing_nullable=True)
-        batch_op.alter_column('currencies',
-               existing_type=sa.PickleType(),
-               type_=sa.VARCHAR(length=200),
-               existing_nullable=True)
-        batch_op.alter_column('timezones',
-               existing_type=sa.PickleType(),
-               type_=sa.VARCHAR(length=200),
-               existing_nullable=True)
-        batch_op.alter_column('population',
-               existing_type=sa.Integer(),
-               type_=sa.BIGINT(),
-               existing_nullable=True)
-        batch_op.alter_column('calling_code',
-               existing_type=sa.String(length=10),
-               type_=sa.VARCHAR(length=20),
-               existing_nullable=True)
-        batch_op.alter_column('capital',
-               existing_type=sa.String(length=128),
-               type_=sa.VARCHAR(length=100),
-               existing_nullable=True)
-        batch_op.drop_column('name')
-
-    # ### end Alembic commands ###
+    # The schema after this revision matches 940ad01e65d3, whose downgrade
+    # reverts these changes, so there is nothing to undo here.
+    pass
@@ -41,7 +41,7 @@ def downgrade():
     sa.Column('user_id', sa.INTEGER(), nullable=False),
     sa.Column('query', sa.VARCHAR(length=256), nullable=True),
     sa.Column('result_type', sa.VARCHAR(length=50), nullable=True),
-    sa.Column('timestamp', sa.DATETIME(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
     sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
     sa.PrimaryKeyConstraint('id')
     )
@@ -49,7 +49,7 @@ def downgrade():
     sa.Column('id', sa.INTEGER(), nullable=False),
     sa.Column('country_name', sa.VARCHAR(length=100), nullable=True),
     sa.Column('user_id', sa.INTEGER(), nullable=False),
-    sa.Column('viewed_at', sa.DATETIME(), nullable=True),
+    sa.Column('viewed_at', sa.DateTime(), nullable=True),
     sa.Column('search_type', sa.VARCHAR(length=50), nullable=False),
     sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
     sa.PrimaryKeyConstraint('id')
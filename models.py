@@ -1,9 +1,13 @@
 import os
+import uuid
 import jwt
 from sqlalchemy.orm import relationship
-from werkzeug.security import generate_password_hash, check_password_hash
-from app import db
-from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import app, db
+from auth_cache import AuthUser, token_cache
+from passwords import password_hasher
+from token_revocation import RevocationList
+from datetime import datetime, timedelta, timezone
 
 
 class User(db.Model):
@@ -14,6 +18,8 @@ class User(db.Model):
     phone = db.Column(db.String(20))
     password_hash = db.Column(db.String(200), nullable=False)
     created = db.Column(db.DateTime, default=datetime.now)
+    # Tokens issued before this moment (UTC) are rejected; stamped on password reset
+    tokens_valid_after = db.Column(db.DateTime, nullable=True)
 
     # Relationships
     # country_history = db.relationship('CountryHistory', back_populates='user', cascade='all, delete-orphan')
@@ -27,29 +33,68 @@ class User(db.Model):
         return f"<User {self.email}>"
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
+
+    def revoke_all_tokens(self):
+        """Reject every token issued so far, in both token modes and on every worker."""
+        self.tokens_valid_after = datetime.utcnow()
+
+    def token_issued_before_cutoff(self, payload):
+        if self.tokens_valid_after is None:
+            return False
+        cutoff = self.tokens_valid_after.replace(tzinfo=timezone.utc).timestamp()
+        return payload.get('iat', 0) < cutoff
 
     def generate_auth_token(self):
         expiry_date = datetime.utcnow() + timedelta(days=10)
-        payload = {'id': self.id, 'exp': expiry_date}
+        # Fractional iat so a login straight after a reset is not caught by its cutoff
+        payload = {'id': self.id, 'exp': expiry_date, 'iat': datetime.now(timezone.utc).timestamp(),
+                   'jti': uuid.uuid4().hex}
         token = jwt.encode(payload, os.environ.get('SECRET_KEY'), algorithm='HS256')
         return token
 
+    @staticmethod
+    def decode_auth_token(token):
+        """Check the signature and exp/iat claims; raises jwt.InvalidTokenError otherwise."""
+        return jwt.decode(token, os.environ.get('SECRET_KEY'), algorithms=['HS256'],
+                          leeway=app.config['AUTH_TOKEN_LEEWAY'])
+
     @staticmethod
     def verify_auth_token(token):
         if not token:
             return None
+
+        # Fast path: token already verified by this worker
+        cached = token_cache.get(token)
+        if cached:
+            return cached
+
         try:
-            active_token = StoredJwtToken.query.filter_by(jwt_token=token).first()
-            if active_token:
-                payload = jwt.decode(token, os.environ.get('SECRET_KEY'), algorithms=['HS256'])
-                return User.query.get(payload['id'])
+            if app.config['AUTH_TOKEN_MODE'] == 'revocation':
+                # Stateless: the signature proves the token, only logouts are stored
+                payload = User.decode_auth_token(token)
+                if 'jti' not in payload or revocation_list.is_revoked(payload['jti']):
+                    return None
+            else:
+                active_token = StoredJwtToken.query.filter_by(jwt_token=token).first()
+                if not active_token:
+                    return None
+                payload = User.decode_auth_token(token)
+
+            user = User.query.get(payload['id'])
+            if user and not user.token_issued_before_cutoff(payload):
+                identity = AuthUser(id=user.id, email=user.email)
+                token_cache.put(token, identity, payload['exp'])
+                return identity
         except jwt.ExpiredSignatureError:
             print('Token has expired')
-        except jwt.DecodeError:
+        except jwt.InvalidTokenError:
             print('Token is invalid')
         return None
 
@@ -62,6 +107,27 @@ class StoredJwtToken(db.Model):
     # Relationship
     user = db.relationship('User', back_populates='stored_jwt_tokens')
 
+
+class RevokedToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+revocation_list = RevocationList(
+    RevokedToken,
+    capacity=app.config['AUTH_REVOCATION_BLOOM_CAPACITY'],
+    sync_interval=app.config['AUTH_REVOCATION_SYNC_INTERVAL'],
+    overlap=app.config['AUTH_REVOCATION_SYNC_OVERLAP']
+)
+
+
+@event.listens_for(StoredJwtToken, 'after_delete')
+def forget_deleted_token(mapper, connection, target):
+    token_cache.invalidate(target.jwt_token)
+
 class PasswordResetToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     token = db.Column(db.String(10), nullable=False)
@@ -72,15 +138,66 @@ class PasswordResetToken(db.Model):
 class Country(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), unique=True, nullable=False)
-    capital = db.Column(db.String(128))
+    official_name = db.Column(db.String(256))
+    cca2 = db.Column(db.String(2), index=True)
+    cca3 = db.Column(db.String(3), index=True)
+    region = db.Column(db.String(64))
+    subregion = db.Column(db.String(64))
+    capital = db.Column(db.String(128))  # primary capital
+    capitals = db.Column(db.JSON)  # every capital, e.g. South Africa has three
+    alt_spellings = db.Column(db.JSON)
     calling_code = db.Column(db.String(10))
     population = db.Column(db.Integer)
-    tld = db.Column(db.String(10))
-    timezones = db.Column(db.PickleType)
-    currencies = db.Column(db.PickleType)
+    tld = db.Column(db.JSON)
+    timezones = db.Column(db.JSON)
+    currencies = db.Column(db.JSON)
     flag = db.Column(db.String(256))
-    languages = db.Column(db.PickleType)
-    latlng = db.Column(db.PickleType)
+    languages = db.Column(db.JSON)
+    latlng = db.Column(db.JSON)
+
+    # Relationships (normalized copies of timezones, currencies and languages for indexed filtering)
+    timezone_rows = db.relationship('CountryTimezone', back_populates='country', cascade='all, delete-orphan')
+    currency_rows = db.relationship('CountryCurrency', back_populates='country', cascade='all, delete-orphan')
+    language_rows = db.relationship('CountryLanguage', back_populates='country', cascade='all, delete-orphan')
+
+    @staticmethod
+    def in_timezone(timezone):
+        return Country.query.join(CountryTimezone).filter(CountryTimezone.timezone == timezone)
+
+    @staticmethod
+    def using_currency(code):
+        return Country.query.join(CountryCurrency).filter(CountryCurrency.code == code.upper())
+
+    @staticmethod
+    def speaking(language):
+        return Country.query.join(CountryLanguage).filter(CountryLanguage.name == language)
+
+
+class CountryTimezone(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    country_id = db.Column(db.Integer, db.ForeignKey('country.id'), nullable=False, index=True)
+    timezone = db.Column(db.String(16), nullable=False, index=True)  # e.g. 'UTC+01:00'
+
+    country = db.relationship('Country', back_populates='timezone_rows')
+
+
+class CountryCurrency(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    country_id = db.Column(db.Integer, db.ForeignKey('country.id'), nullable=False, index=True)
+    code = db.Column(db.String(3), nullable=False, index=True)  # e.g. 'EUR'
+    name = db.Column(db.String(64))
+    symbol = db.Column(db.String(16))
+
+    country = db.relationship('Country', back_populates='currency_rows')
+
+
+class CountryLanguage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    country_id = db.Column(db.Integer, db.ForeignKey('country.id'), nullable=False, index=True)
+    code = db.Column(db.String(3), nullable=False, index=True)  # e.g. 'eng'
+    name = db.Column(db.String(64), nullable=False, index=True)
+
+    country = db.relationship('Country', back_populates='language_rows')
 
 
 class UserSearchHistory(db.Model):
@@ -92,13 +209,34 @@ class UserSearchHistory(db.Model):
 
     # For feature searches (e.g., timezone, currency)
     search_query = db.Column(db.String(256), nullable=True)
-    search_type = db.Column(db.String(50), nullable=True)  # e.g., 'timezone', 'currency', 'full_info'
+    search_type = db.Column(db.String(50), nullable=True)  # e.g., 'timezone', 'currency', 'language', 'region', 'full_info'
     extra_info = db.Column(db.String(256))  # e.g. 'capital,population,languages'
     viewed_at = db.Column(db.DateTime, default=datetime.now)
 
 
     user = db.relationship('User', back_populates='search_history')
 
+    # Serves /history keyset pages: one user's rows, newest first (read backwards)
+    __table_args__ = (
+        db.Index('ix_user_search_history_user_id_viewed_at', 'user_id', 'viewed_at', 'id'),
+    )
+
+
+class CountrySearchCount(db.Model):
+    """Running total of searches per country, kept up to date as history is written."""
+    country_name = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0, index=True)
+
+
+class UserCountrySearchCount(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    country_name = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_user_country_search_count_user_id_count', 'user_id', 'count'),
+    )
+
 
 # class CountryHistory(db.Model):
 #     id = db.Column(db.Integer, primary_key=True)
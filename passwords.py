@@ -0,0 +1,90 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_method(method):
+    """Spell out werkzeug's defaults so stored hashes can be compared to the config.
+
+    'scrypt' -> 'scrypt:32768:8:1', 'pbkdf2' -> 'pbkdf2:sha256:<default iterations>'
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    return method
+
+
+class PasswordHasher:
+    """Runs password hashing in a bounded process pool, off the request thread.
+
+    `workers=0` hashes inline. The pool is created on first use, by then from
+    a process running background threads, so its workers are started from a
+    forkserver (spawn where that is unavailable) rather than forked. If a
+    worker dies (e.g. killed for memory mid-hash) the pool is replaced and
+    the call retried once, then run inline.
+    """
+
+    def __init__(self, method='scrypt', workers=2):
+        self.method = normalize_method(method)
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when the hash was made with a different algorithm or cost than configured."""
+        return password_hash.split('$', 1)[0] != self.method
+
+    def _run(self, function, *args):
+        if self.workers <= 0:
+            return function(*args)
+        for _ in range(2):
+            pool = self._executor()
+            try:
+                return pool.submit(function, *args).result()
+            except BrokenProcessPool:
+                logger.warning('Password hashing pool broke, starting a new one')
+                self._discard(pool)
+        return function(*args)
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    methods = multiprocessing.get_all_start_methods()
+                    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def _discard(self, pool):
+        # Concurrent callers share one broken pool; only the first replaces it
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+password_hasher = PasswordHasher(method=Config.PASSWORD_HASH_METHOD, workers=Config.PASSWORD_HASH_WORKERS)
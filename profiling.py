@@ -0,0 +1,137 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from config import Config
+
+
+CAPTURE_ID = re.compile(r'^\d{8}T\d{6}-\d{6}-[0-9a-f]{8}$')
+
+
+def collapse(frame):
+    """One stack in the collapsed format flamegraph.pl and speedscope read: root;...;leaf"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Capture:
+    """Profiles the calling thread until stop().
+
+    cProfile records every call; alongside it a sampler thread snapshots the
+    thread's stack every `sample_interval` seconds for the flamegraph.
+    """
+
+    def __init__(self, sample_interval=0.001):
+        self.sample_interval = sample_interval
+        self.profile = cProfile.Profile()
+        self.stacks = Counter()
+        self.duration = None
+        self._thread_id = threading.get_ident()
+        self._done = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._sampler.start()
+        self.profile.enable()
+        return self
+
+    def stop(self):
+        self.profile.disable()
+        self.duration = time.perf_counter() - self._started
+        self._done.set()
+        self._sampler.join()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+
+class ProfileStore:
+    """Bounded on-disk ring of captures; the oldest are deleted past `max_captures`.
+
+    Each capture is three files sharing its id: <id>.json (what was profiled),
+    <id>.pstats (cProfile output, for pstats or snakeviz) and <id>.stacks
+    (collapsed stacks). Ids sort by creation time, so several worker processes
+    can share one directory.
+    """
+
+    KINDS = ('json', 'pstats', 'stacks')
+
+    def __init__(self, directory, max_captures=50):
+        self.directory = directory
+        self.max_captures = max_captures
+
+    def save(self, capture, **info):
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        capture_id = f'{time.strftime("%Y%m%dT%H%M%S", time.localtime(now))}-{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:8]}'
+
+        capture.profile.dump_stats(self.path(capture_id, 'pstats'))
+        with open(self.path(capture_id, 'stacks'), 'w', encoding='utf-8') as f:
+            for stack, count in capture.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        info = dict(info, id=capture_id, created_at=now,
+                    duration_ms=round(capture.duration * 1000, 3), samples=sum(capture.stacks.values()))
+        # Written last: a capture is listed once its metadata exists
+        with open(self.path(capture_id, 'json'), 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+
+        self._prune()
+        return capture_id
+
+    def list(self):
+        captures = []
+        for capture_id in self._ids():
+            try:
+                with open(self.path(capture_id, 'json'), encoding='utf-8') as f:
+                    captures.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return captures
+
+    def path(self, capture_id, kind):
+        if not CAPTURE_ID.match(capture_id) or kind not in self.KINDS:
+            raise ValueError(f'Invalid capture {capture_id!r}.{kind}')
+        return os.path.join(self.directory, f'{capture_id}.{kind}')
+
+    def text_report(self, capture_id, limit=50):
+        """The top `limit` functions by cumulative time, as pstats prints them."""
+        out = io.StringIO()
+        pstats.Stats(self.path(capture_id, 'pstats'), stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def _ids(self):
+        """Newest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted((name[:-len('.json')] for name in names
+                       if name.endswith('.json') and CAPTURE_ID.match(name[:-len('.json')])), reverse=True)
+
+    def _prune(self):
+        for capture_id in self._ids()[self.max_captures:]:
+            for kind in self.KINDS:
+                try:
+                    os.remove(self.path(capture_id, kind))
+                except FileNotFoundError:
+                    pass
+
+
+profile_store = ProfileStore(Config.PROFILE_DIR, max_captures=Config.PROFILE_MAX_CAPTURES)
@@ -0,0 +1,101 @@
+import hmac
+import random
+import threading
+
+from flask import g, jsonify, request, send_file
+
+from app import app
+from profiling import Capture, profile_store
+
+
+# cProfile allows one active profiler per process on newer Pythons, so
+# requests arriving while another is being profiled just run unprofiled
+capture_lock = threading.Lock()
+
+
+def authorized(value, prefix=''):
+    token = app.config['PROFILE_TOKEN']
+    return bool(token) and hmac.compare_digest(value or '', prefix + token)
+
+
+def profile_trigger():
+    """Why this request should be profiled, or None (the common case)."""
+    if 'X-Profile' in request.headers and authorized(request.headers['X-Profile']):
+        return 'header'
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate:
+        return 'sampled'
+    return None
+
+
+def finish_capture(status):
+    capture = g.pop('profile_capture', None)
+    if capture is None:
+        return None
+    try:
+        capture.stop()
+        return profile_store.save(
+            capture, trigger=g.pop('profile_trigger'), endpoint=request.endpoint,
+            method=request.method, path=request.path, status=status)
+    finally:
+        capture_lock.release()
+
+
+# Hooks are only installed when profiling can be triggered at all
+if app.config['PROFILE_SAMPLE_RATE'] or app.config['PROFILE_TOKEN']:
+    @app.before_request
+    def start_profile():
+        trigger = profile_trigger()
+        if trigger and not request.path.startswith('/admin/profiles') and capture_lock.acquire(blocking=False):
+            g.profile_trigger = trigger
+            g.profile_capture = Capture(app.config['PROFILE_SAMPLE_INTERVAL']).start()
+
+    @app.after_request
+    def save_profile(response):
+        capture_id = finish_capture(response.status_code)
+        if capture_id:
+            response.headers['X-Profile-Id'] = capture_id
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        # The view raised past the error handlers, so after_request never ran
+        if 'profile_capture' in g:
+            finish_capture(500)
+
+
+def admin_required():
+    if not app.config['PROFILE_TOKEN']:
+        return jsonify({'error': 'Not found'}), 404
+    if not authorized(request.headers.get('Authorization'), 'Bearer '):
+        return jsonify({'error': 'Unauthorized access'}), 401
+    return None
+
+
+# -------- PROFILE CAPTURE ROUTES (Authorization: Bearer <PROFILE_TOKEN>) ----------
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    denied = admin_required()
+    if denied:
+        return denied
+    return jsonify(profile_store.list()), 200
+
+
+# ?format=pstats (default, binary for pstats/snakeviz), text (top functions) or stacks (collapsed, for flamegraphs)
+@app.route('/admin/profiles/<capture_id>', methods=['GET'])
+def download_profile(capture_id):
+    denied = admin_required()
+    if denied:
+        return denied
+
+    output = request.args.get('format', 'pstats')
+    if output not in ('pstats', 'text', 'stacks'):
+        return jsonify({'error': 'format must be pstats, text or stacks'}), 400
+    try:
+        path = profile_store.path(capture_id, 'stacks' if output == 'stacks' else 'pstats')
+        if output == 'text':
+            return app.response_class(profile_store.text_report(capture_id), mimetype='text/plain')
+        return send_file(path, mimetype='application/octet-stream' if output == 'pstats' else 'text/plain',
+                         as_attachment=True, download_name=f'{capture_id}.{output}')
+    except (ValueError, FileNotFoundError):
+        return jsonify({'error': 'Capture not found'}), 404
@@ -0,0 +1,85 @@
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from metrics import STAGE_SECONDS, UPSTREAM_BYTES, UPSTREAM_REQUESTS, timed
+
+
+# Every field the country routes read from a restcountries record
+FIELDS = (
+    'name', 'cca2', 'cca3', 'altSpellings', 'capital', 'region', 'subregion', 'population',
+    'idd', 'timezones', 'currencies', 'languages', 'flags', 'latlng', 'tld',
+)
+
+# restcountries rejects requests for more than 10 fields at once, so the
+# dataset is fetched in groups that share cca3 as the join key
+MAX_FIELDS_PER_REQUEST = 10
+JOIN_FIELD = 'cca3'
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RestCountriesClient:
+    """Shared restcountries client.
+
+    Keeps connections alive through one requests.Session, asks only for the
+    fields we use, applies connect/read timeouts and retries transient failures
+    with exponential backoff and full jitter.
+    """
+
+    def __init__(self, base_url, connect_timeout=3.05, read_timeout=10, retries=3,
+                 backoff=0.5, pool_size=4):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @timed(STAGE_SECONDS.labels('upstream_fetch'))
+    def fetch_all(self, fields=FIELDS):
+        """Every country with just `fields`, merged from as many requests as needed."""
+        others = [f for f in fields if f != JOIN_FIELD]
+        group_size = MAX_FIELDS_PER_REQUEST - 1
+        groups = [others[i:i + group_size] for i in range(0, len(others), group_size)]
+
+        merged = {}
+        order = []
+        for group in groups:
+            for country in self.get('/all', params={'fields': ','.join([JOIN_FIELD] + group)}):
+                key = country.get(JOIN_FIELD)
+                if key not in merged:
+                    merged[key] = {}
+                    order.append(key)
+                merged[key].update(country)
+        return [merged[key] for key in order]
+
+    def get(self, path, params=None):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+                UPSTREAM_REQUESTS.labels(response.status_code).inc()
+                UPSTREAM_BYTES.inc(len(response.content))
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()
+            except (requests.ConnectionError, requests.Timeout):
+                UPSTREAM_REQUESTS.labels('error').inc()
+                if attempt == self.retries:
+                    raise
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+
+client = RestCountriesClient(
+    Config.RESTCOUNTRIES_URL,
+    connect_timeout=Config.RESTCOUNTRIES_CONNECT_TIMEOUT,
+    read_timeout=Config.RESTCOUNTRIES_READ_TIMEOUT,
+    retries=Config.RESTCOUNTRIES_RETRIES,
+    pool_size=Config.RESTCOUNTRIES_POOL_SIZE
+)
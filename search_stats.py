@@ -0,0 +1,120 @@
+from collections import Counter
+
+import click
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import app, db
+from models import CountrySearchCount, UserCountrySearchCount, UserSearchHistory
+
+
+def _upsert_counts(model, key_columns, rows):
+    """Add each row's count onto the stored counter, creating missing rows."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite if dialect == 'sqlite' else postgresql).insert(model)
+        statement = insert.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={'count': model.count + insert.excluded['count']}
+        )
+        db.session.execute(statement, rows)
+        return
+
+    for row in rows:
+        key = {column: row[column] for column in key_columns}
+        updated = db.session.execute(
+            db.update(model).filter_by(**key).values(count=model.count + row['count'])
+        ).rowcount
+        if not updated:
+            db.session.add(model(**row))
+
+
+def record_counts(history_rows):
+    """Fold a batch of new history rows into the counters.
+
+    Runs inside the caller's transaction so counters and history commit together.
+    """
+    add_counts(Counter((row['user_id'], row['country_name']) for row in history_rows if row.get('country_name')))
+
+
+def add_counts(per_user):
+    """Add a Counter of (user_id, country_name) -> searches onto both counter tables."""
+    if not per_user:
+        return
+
+    per_country = Counter()
+    for (_, country_name), count in per_user.items():
+        per_country[country_name] += count
+
+    _upsert_counts(UserCountrySearchCount, ['user_id', 'country_name'], [
+        {'user_id': user_id, 'country_name': country_name, 'count': count}
+        for (user_id, country_name), count in per_user.items()
+    ])
+    _upsert_counts(CountrySearchCount, ['country_name'], [
+        {'country_name': country_name, 'count': count} for country_name, count in per_country.items()
+    ])
+
+
+def subtract_counts(per_user):
+    """Take a Counter of (user_id, country_name) -> searches off both counter tables."""
+    if not per_user:
+        return
+    add_counts(Counter({key: -count for key, count in per_user.items()}))
+    # A rebuild has no row for a pair with no history left, so neither do we
+    db.session.execute(db.delete(UserCountrySearchCount).where(UserCountrySearchCount.count <= 0))
+    db.session.execute(db.delete(CountrySearchCount).where(CountrySearchCount.count <= 0))
+
+
+def delete_history(user_id, history_id=None):
+    """Delete one of a user's history rows, or all of them, and take them off the counters.
+
+    Runs inside the caller's transaction so the counters keep matching what
+    `rebuild-search-stats` would compute. Returns the number of rows deleted.
+    """
+    conditions = [UserSearchHistory.user_id == user_id]
+    if history_id is not None:
+        conditions.append(UserSearchHistory.id == history_id)
+    statement = db.delete(UserSearchHistory).where(*conditions).execution_options(synchronize_session=False)
+
+    if db.session.get_bind().dialect.delete_returning:
+        names = db.session.execute(statement.returning(UserSearchHistory.country_name)).scalars().all()
+    else:
+        names = db.session.execute(db.select(UserSearchHistory.country_name).where(*conditions)).scalars().all()
+        db.session.execute(statement)
+
+    subtract_counts(Counter((user_id, name) for name in names if name))
+    return len(names)
+
+
+def top_countries(limit=10, user_id=None):
+    if user_id is None:
+        query = db.select(CountrySearchCount.country_name, CountrySearchCount.count)
+    else:
+        query = db.select(UserCountrySearchCount.country_name, UserCountrySearchCount.count) \
+            .where(UserCountrySearchCount.user_id == user_id)
+    rows = db.session.execute(query.order_by(db.desc('count')).limit(limit)).all()
+    return [{'country_name': name, 'searches': count} for name, count in rows]
+
+
+def rebuild_counts():
+    """Recompute every counter from the raw search history."""
+    rows = db.session.execute(
+        db.select(UserSearchHistory.user_id, UserSearchHistory.country_name, db.func.count())
+        .where(UserSearchHistory.country_name.isnot(None))
+        .group_by(UserSearchHistory.user_id, UserSearchHistory.country_name)
+    ).all()
+
+    try:
+        db.session.execute(db.delete(UserCountrySearchCount))
+        db.session.execute(db.delete(CountrySearchCount))
+        add_counts(Counter({(user_id, country_name): count for user_id, country_name, count in rows}))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
+
+
+@app.cli.command('rebuild-search-stats')
+def rebuild_search_stats_command():
+    """Recompute the search counters from user_search_history."""
+    click.echo(f'Rebuilt search counters from {rebuild_counts()} user/country pairs')
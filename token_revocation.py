@@ -0,0 +1,87 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app import db
+from bloom import BloomFilter
+
+
+class RevocationList:
+    """Revoked token ids backed by the database, fronted by a Bloom filter.
+
+    Used when AUTH_TOKEN_MODE is 'revocation': tokens are verified from their
+    signature alone and only logged-out tokens are stored. A token whose jti
+    is not in the filter is known to be valid without a query. Filter hits are
+    confirmed against the table. Every `sync_interval` seconds the filter picks
+    up rows revoked by other workers with a single indexed query on revoked_at.
+
+    The ids and timestamps of concurrent transactions do not commit in order,
+    so a row can become visible after a later one was already synced. Each
+    sync therefore re-reads the last `overlap` seconds before the newest
+    revoked_at it has seen, which also covers clock skew between workers.
+    """
+
+    def __init__(self, model, capacity=100000, error_rate=0.001, sync_interval=5, overlap=60):
+        self.model = model
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.overlap = timedelta(seconds=overlap)
+        self.bloom = None
+        self._last_revoked_at = None
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        self._sync_if_due()
+        if jti not in self.bloom:
+            return False
+        return db.session.query(self.model.id).filter_by(jti=jti).first() is not None
+
+    def revoke(self, jti, user_id, expires_at):
+        db.session.add(self.model(jti=jti, user_id=user_id, expires_at=expires_at))
+        db.session.commit()
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def rebuild(self):
+        """Reload the filter from every revocation that has not expired yet."""
+        rows = db.session.execute(
+            db.select(self.model.id, self.model.jti).where(self.model.expires_at > datetime.utcnow())
+        ).all()
+        bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+        for _, jti in rows:
+            bloom.add(jti)
+        last_revoked_at = db.session.execute(db.select(db.func.max(self.model.revoked_at))).scalar()
+        with self._lock:
+            self.bloom = bloom
+            self._last_revoked_at = last_revoked_at
+            self._next_sync = time.monotonic() + self.sync_interval
+
+    def _sync_if_due(self):
+        if self.bloom is None or self.bloom.count > self.bloom.capacity:
+            self.rebuild()
+            return
+        if time.monotonic() < self._next_sync:
+            return
+
+        query = db.select(self.model.jti, self.model.revoked_at)
+        if self._last_revoked_at is not None:
+            query = query.where(self.model.revoked_at >= self._last_revoked_at - self.overlap)
+        rows = db.session.execute(query).all()
+        with self._lock:
+            for jti, revoked_at in rows:
+                # Rows inside the overlap come back every sync; only count new ones
+                if jti not in self.bloom:
+                    self.bloom.add(jti)
+                if revoked_at is not None and (self._last_revoked_at is None or revoked_at > self._last_revoked_at):
+                    self._last_revoked_at = revoked_at
+            self._next_sync = time.monotonic() + self.sync_interval
+
+    def prune(self):
+        """Delete revocations whose token has expired anyway; returns the count."""
+        deleted = self.model.query.filter(self.model.expires_at <= datetime.utcnow()).delete()
+        db.session.commit()
+        self.rebuild()
+        return deleted
@@ -6,6 +6,7 @@ import string
 from flask_mail import Message
 
 from app import mail
+from mail_queue import mail_queue
 
 from config import Config
 def is_valid_email(email):
@@ -22,9 +23,12 @@ def is_valid_email(email):
     
 
 def send_email(subject, receiver, text_body, html_body):
+    # Returns the mail queue job id, or None when the queue is disabled and the mail went out inline
     msg = Message(subject=subject, sender=('Queen', Config.MAIL_USERNAME), recipients=[receiver])
     msg.body = text_body
     msg.html = html_body
+    if Config.MAIL_QUEUE_ENABLED:
+        return mail_queue.enqueue(msg)
     mail.send(msg)
 
 
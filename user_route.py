@@ -1,9 +1,14 @@
 from flask import jsonify, request, make_response
 from app import app, db
-from models import PasswordResetToken, User, StoredJwtToken
+from models import PasswordResetToken, User, StoredJwtToken, revocation_list
+from auth_cache import token_cache
 from toolz import is_valid_email, random_generator, send_email
+from mail_queue import mail_queue
 from flask_httpauth import HTTPTokenAuth
-import os
+from metrics import STAGE_SECONDS, timed
+import click
+import jwt
+from datetime import datetime
 
 auth = HTTPTokenAuth(scheme='Bearer')
 
@@ -14,6 +19,7 @@ def unauthorized():
 
 
 @auth.verify_token
+@timed(STAGE_SECONDS.labels('auth'))
 def verify_token(token):
     return User.verify_auth_token(token)
 
@@ -68,19 +74,48 @@ def login_user():
     if user is None:
         return jsonify({'error': 'User with this email does not exist'}), 404
 
-    if not user.check_password(password):
+    with STAGE_SECONDS.labels('password_verify').time():
+        valid = user.check_password(password)
+    if not valid:
         return jsonify({'error': 'Invalid email or password'}), 401
 
+    # Upgrade hashes made with an older algorithm or cost while we have the password
+    if user.password_needs_rehash():
+        user.set_password(password)
+
     token = user.generate_auth_token()
 
-    # Save JWT token
-    token_record = StoredJwtToken(jwt_token=token, user=user)
-    db.session.add(token_record)
-    db.session.commit()
+    # Save JWT token (revocation mode only stores tokens once they are logged out)
+    if app.config['AUTH_TOKEN_MODE'] != 'revocation':
+        token_record = StoredJwtToken(jwt_token=token, user=user)
+        db.session.add(token_record)
+    with STAGE_SECONDS.labels('db_commit').time():
+        db.session.commit()
 
     return jsonify({'success': True, 'token': token, 'message': 'You are logged in'}), 200
 
 
+# -------- USER LOGOUT ROUTE ----------
+@app.route('/logout', methods=['POST'])
+@auth.login_required
+def logout_user():
+    token = auth.get_auth().token
+
+    if app.config['AUTH_TOKEN_MODE'] == 'revocation':
+        try:
+            payload = User.decode_auth_token(token)
+        except jwt.InvalidTokenError:
+            payload = None  # expired since it was verified: nothing left to revoke
+        if payload is not None:
+            revocation_list.revoke(payload['jti'], payload['id'], datetime.utcfromtimestamp(payload['exp']))
+    else:
+        StoredJwtToken.query.filter_by(jwt_token=token).delete()
+        db.session.commit()
+    token_cache.invalidate(token)
+
+    return jsonify({'success': True, 'message': 'You are logged out'}), 200
+
+
 # -------- FORGOT PASSWORD ROUTE ----------
 @app.route('/forget-password', methods=['POST'])
 def forgot_password():
@@ -104,11 +139,11 @@ def forgot_password():
     html_body = f'<h1>{text_body}</h1>'
 
     try:
-        send_email(subject=subject, receiver=email, text_body=text_body, html_body=html_body)
+        email_id = send_email(subject=subject, receiver=email, text_body=text_body, html_body=html_body)
     except Exception as e:
         return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
 
-    return jsonify({'success': True, 'message': 'Password reset email sent'}), 200
+    return jsonify({'success': True, 'message': 'Password reset email sent', 'email_id': email_id}), 200
 
 
 # -------- RESET PASSWORD ROUTE ----------
@@ -135,7 +170,13 @@ def reset_password():
 
     user.set_password(new_password)
     reset.used = True
+
+    # Log out every existing session for this user. Revocation mode stores no
+    # tokens to delete, so the cutoff is what rejects them there.
+    StoredJwtToken.query.filter_by(user_id=user.id).delete()
+    user.revoke_all_tokens()
     db.session.commit()
+    token_cache.invalidate_user(user.id)
 
     return jsonify({'success': True, 'message': 'Password reset successfully'}), 200
 
@@ -152,8 +193,28 @@ def send_test_email():
         otp = random_generator()
         subject = 'Pediforte OTP'
         message = f'Use this code as your Pediforte OTP: {otp}'
-        send_email(subject=subject, receiver=email, text_body=message, html_body=f'<h1>{message}</h1>')
+        email_id = send_email(subject=subject, receiver=email, text_body=message, html_body=f'<h1>{message}</h1>')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-    return jsonify({'success': True, 'message': 'Email sent successfully'}), 200
+    return jsonify({'success': True, 'message': 'Email sent successfully', 'email_id': email_id}), 200
+
+
+# -------- MAIL QUEUE STATUS ROUTE ----------
+@app.route('/mail_queue/status', methods=['GET'])
+@auth.login_required
+def mail_queue_status():
+    email_id = request.args.get('id')
+    if email_id is None:
+        return jsonify(mail_queue.status()), 200
+
+    status = mail_queue.status(email_id)
+    if status is None:
+        return jsonify({'error': 'Email not found'}), 404
+    return jsonify(status), 200
+
+
+@app.cli.command('prune-revoked-tokens')
+def prune_revoked_tokens_command():
+    """Delete revoked tokens that have expired anyway."""
+    click.echo(f'Pruned {revocation_list.prune()} expired revoked tokens')